@@ -13,6 +13,7 @@ index = {"Dashboard": "core.dashboards.ipynb",
          "DatasetFilterWithScatter": "core.dashboards.ipynb",
          "DatasetGenerator": "core.dashboards.ipynb",
          "DatasetGeneratorScatter": "core.dashboards.ipynb",
+         "ListChange": "core.data.ipynb",
          "Observable": "core.data.ipynb",
          "ObservableList": "core.data.ipynb",
          "DatasetDescriptor": "core.data.ipynb",
@@ -28,8 +29,11 @@ index = {"Dashboard": "core.dashboards.ipynb",
          "InstanceSegmentationDatasetGeneratorScatter": "dashboards.ipynb",
          "InstanceSegmentationDatasetGeneratorRange": "dashboards.ipynb",
          "InstanceSegmentationResultOverview": "dashboards.ipynb",
+         "FileMetadataScanner": "data.ipynb",
          "RecordDataframeParser": "data.ipynb",
+         "LazyRecordList": "data.ipynb",
          "RecordDataset": "data.ipynb",
+         "RecordDataDescriptor": "data.ipynb",
          "ResultsDataset": "data.ipynb",
          "BboxRecordDataframeParser": "data.ipynb",
          "DataDescriptorBbox": "data.ipynb",
@@ -49,8 +53,16 @@ index = {"Dashboard": "core.dashboards.ipynb",
          "InstanceSegmentationRecordDataset": "data.ipynb",
          "PrecisionRecallMetricsDescriptorInstanceSegmentation": "data.ipynb",
          "InstanceSegmentationResultsDataset": "data.ipynb",
+         "ResultsAccumulator": "data.ipynb",
+         "ScoreStats": "metrics.ipynb",
          "APObjectDetection": "metrics.ipynb",
          "APInstanceSegmentation": "metrics.ipynb",
+         "APAccumulator": "metrics.ipynb",
+         "APObjectDetectionAccumulator": "metrics.ipynb",
+         "APInstanceSegmentationAccumulator": "metrics.ipynb",
+         "MetricDataCache": "metrics.ipynb",
+         "ClassConfusionMatrix": "metrics.ipynb",
+         "ClassConfusionMatrixInstanceSegmentation": "metrics.ipynb",
          "Filter": "plotting.controls.ipynb",
          "RangeFilter": "plotting.controls.ipynb",
          "CategoricalFilter": "plotting.controls.ipynb",
@@ -75,8 +87,19 @@ index = {"Dashboard": "core.dashboards.ipynb",
          "erles_to_string": "utils.ipynb",
          "erles_to_counts_to_utf8": "utils.ipynb",
          "string_to_erles": "utils.ipynb",
+         "erles_to_areas": "utils.ipynb",
          "correct_mask": "utils.ipynb",
-         "decorrect_mask": "utils.ipynb"}
+         "decorrect_mask": "utils.ipynb",
+         "encode_strings": "utils.ipynb",
+         "decode_strings": "utils.ipynb",
+         "save_dataframe_as_npz": "utils.ipynb",
+         "load_npz_arrays": "utils.ipynb",
+         "EncodedStrings": "utils.ipynb",
+         "load_encoded_dataframe_from_npz": "utils.ipynb",
+         "load_dataframe_from_npz": "utils.ipynb",
+         "compact_dataframe": "utils.ipynb",
+         "expand_dataframe": "utils.ipynb",
+         "memory_usage_report": "utils.ipynb"}
 
 modules = ["core/dashboards.py",
            "core/data.py",
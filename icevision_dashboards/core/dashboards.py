@@ -196,6 +196,7 @@ class MultiDatasetOverview(Dashboard):
     """
     Same as the `DatasetOverview` dashboard but takes a list of datasets and presents the dataset stats in a table.
     The list of datasets can be expanded by adding new entryies to the datasets attribute or elements can be removed with the delete button.
+    Every change of the datasets updates the table, add several datasets inside of `with overview.datasets.batch():` to update it once.
     """
     DESCRIPTOR_DATA = "stats"
 
@@ -219,7 +220,10 @@ class MultiDatasetOverview(Dashboard):
 
     def delete_entry(self, clicks):
         selection = self.overview_table.selection
-        self.datasets.list = [dataset for index, dataset in enumerate(self.datasets) if index not in selection]
+        # the table is updated once for all deleted entries
+        with self.datasets.batch():
+            for index in sorted(set(selection), reverse=True):
+                self.datasets.pop(index)
 
     def update_table(self, event):
         self.overview_table.value = self.create_overview_df()
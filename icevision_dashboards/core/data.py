@@ -1,32 +1,93 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/core.data.ipynb (unless otherwise specified).
 
-__all__ = ['Observable', 'ObservableList', 'DatasetDescriptor', 'StringDescriptor', 'GenericDataset']
+__all__ = ['ListChange', 'Observable', 'ObservableList', 'DatasetDescriptor', 'StringDescriptor', 'GenericDataset']
 
 # Cell
 from typing import Union, Optional, Any, Iterable, Callable
+from contextlib import contextmanager
 import os
 import shutil
 from abc import ABC, abstractmethod
 
+# Cell
+class ListChange:
+    """A change of an ObservableList. kind is one of KINDS, index the position of the change, removed the removed items (that were at index) and added the added items
+    (that are now at index). A "reset" means that the list was replaced, everything derived from it needs to be recomputed."""
+    KINDS = ["append", "extend", "insert", "remove", "pop", "setitem", "reset"]
+
+    def __init__(self, kind: str, index: int = 0, removed: Optional[list] = None, added: Optional[list] = None):
+        if kind not in self.KINDS:
+            raise ValueError("kind has to be one of " + str(self.KINDS) + ".")
+        self.kind = kind
+        self.index = index
+        self.removed = [] if removed is None else removed
+        self.added = [] if added is None else added
+
+    def __repr__(self):
+        return "ListChange(" + self.kind + ", index=" + str(self.index) + ", removed=" + str(len(self.removed)) + ", added=" + str(len(self.added)) + ")"
+
 # Cell
 class Observable(ABC):
-    """Simple implementation of the observer pattern."""
-    def __init__(self, callbacks=None):
+    """Simple implementation of the observer pattern. The callbacks are called with the observable, the change callbacks with the observable and the change
+    (e.g. a ListChange) to be able to update incrementally."""
+    def __init__(self, callbacks=None, change_callbacks=None):
         self._callbacks = [] if callbacks is None else callbacks
+        self._change_callbacks = [] if change_callbacks is None else change_callbacks
 
     def register_callback(self, callback: Callable):
         self._callbacks.append(callback)
 
-    def trigger_callbacks(self):
+    def register_change_callback(self, callback: Callable):
+        self._change_callbacks.append(callback)
+
+    def trigger_callbacks(self, change: Any = None):
         for callback in self._callbacks:
             callback(self)
+        for callback in self._change_callbacks:
+            callback(self, change)
 
 # Cell
 class ObservableList(Observable):
-    """List with observer pattern. The internal list prepresentation can be accessed with the list attribute"""
-    def __init__(self, observable_list: list, callbacks=None):
+    """List with observer pattern. The internal list prepresentation can be accessed with the list attribute.
+    Every change triggers the callbacks, the change callbacks get a ListChange that describes the change.
+    Inside of a batch (context manager) the changes are collected and the callbacks are triggered once at the end of the batch."""
+    def __init__(self, observable_list: list, callbacks=None, change_callbacks=None):
         self._list = observable_list
-        super().__init__(callbacks)
+        self._batch_depth = 0
+        self._batch_changes = []
+        super().__init__(callbacks, change_callbacks)
+
+    def trigger_callbacks(self, change: Any = None):
+        if self._batch_depth > 0:
+            self._batch_changes.append(change)
+        else:
+            super().trigger_callbacks(change)
+
+    @contextmanager
+    def batch(self):
+        """Collects all changes inside of the with block and triggers the callbacks once at the end (of the outermost batch), if anything changed.
+        The change callbacks get the merged changes (see merge_changes)."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and len(self._batch_changes) > 0:
+                changes, self._batch_changes = self._batch_changes, []
+                self.trigger_callbacks(self.merge_changes(changes))
+
+    @staticmethod
+    def merge_changes(changes: list):
+        """Merges consecutive additions (every one directly behind the items of the previous one, e.g. appends) into a single change.
+        Returns a reset if the changes can't be described by one change."""
+        additions = ["append", "extend", "insert"]
+        merged_change = changes[0]
+        for change in changes[1:]:
+            if merged_change is None or change is None or merged_change.kind not in additions or change.kind not in additions or change.index != merged_change.index+len(merged_change.added):
+                return ListChange("reset")
+            kind = "insert" if "insert" in [merged_change.kind, change.kind] else "extend"
+            merged_change = ListChange(kind, merged_change.index, added=merged_change.added+change.added)
+        return merged_change
 
     @property
     def list(self):
@@ -35,7 +96,7 @@ class ObservableList(Observable):
     @list.setter
     def list(self, value: Any):
         self._list = value
-        self.trigger_callbacks()
+        self.trigger_callbacks(ListChange("reset"))
 
     def __repr__(self):
         return self._list.__repr__()
@@ -51,37 +112,51 @@ class ObservableList(Observable):
         return self._list[index]
 
     def __setitem__(self, index: int, value: Any):
-        self._list[index] = value
-        self.trigger_callbacks()
+        if isinstance(index, slice):
+            self._list[index] = value
+            self.trigger_callbacks(ListChange("reset"))
+        else:
+            index = range(len(self._list))[index]
+            removed_item = self._list[index]
+            self._list[index] = value
+            self.trigger_callbacks(ListChange("setitem", index, [removed_item], [value]))
 
     def __add__(self, other):
         # turn the callbacks first into a set and than back into a list to avoid callbacks being triggered multiple times
         new_callbacks = list(set(self._callbacks+other._callbacks))
-        return ObservableList(self.list + other.list, new_callbacks)
+        new_change_callbacks = list(set(self._change_callbacks+other._change_callbacks))
+        return ObservableList(self.list + other.list, new_callbacks, new_change_callbacks)
 
     def append(self, item: Any):
         self._list.append(item)
-        self.trigger_callbacks()
+        self.trigger_callbacks(ListChange("append", len(self._list)-1, added=[item]))
 
     def remove(self, item: Any):
-        self._list.remove(item)
-        self.trigger_callbacks()
+        index = self._list.index(item)
+        del self._list[index]
+        self.trigger_callbacks(ListChange("remove", index, removed=[item]))
 
     def insert(self, index: int, item: Any):
+        # the item ends up at the clipped index (like list.insert)
+        index = max(0, min(len(self._list), index if index >= 0 else len(self._list)+index))
         self._list.insert(index, item)
-        self.trigger_callbacks()
+        self.trigger_callbacks(ListChange("insert", index, added=[item]))
 
     def pop(self, index: int = -1):
+        index = range(len(self._list))[index]
         poped_item = self._list.pop(index)
-        self.trigger_callbacks()
+        self.trigger_callbacks(ListChange("pop", index, removed=[poped_item]))
         return poped_item
 
     def extend(self, iterable: Iterable):
-        self._list.extend(iterable)
-        self.trigger_callbacks()
+        items = list(iterable)
+        index = len(self._list)
+        self._list.extend(items)
+        self.trigger_callbacks(ListChange("extend", index, added=items))
 
     def clear(self):
         self._list = []
+        self.trigger_callbacks(ListChange("reset"))
 
     def count(self, item):
         return self._list.count(item)
@@ -91,9 +166,11 @@ class ObservableList(Observable):
 
     def reverse(self):
         self._list.reverse()
+        self.trigger_callbacks(ListChange("reset"))
 
     def sort(self, key=float, reverse=False):
         self._list.sort(key=key, reverse=reverse)
+        self.trigger_callbacks(ListChange("reset"))
 
 # Cell
 class DatasetDescriptor(ABC):
@@ -102,9 +179,12 @@ class DatasetDescriptor(ABC):
     The __get__ function will call the calculate_description function if the value of the descriptor is None and then return the value else it will just return the value of the descriptor.
     The __set__ function only allows for the attribute to be set to None, which will trigger a recomputation the next time the __get__ function is called.
     When inheriting this class the function calculate_description needs to be implemented, which defines how the private value should be calculated.
+    depends_on lists the names of the descriptors of the dataset the description is calculated from, descriptors without dependencies are calculated from the base data.
     """
+    depends_on = []
+
     def __set_name__(self, owner, name):
-        owner._descriptors.append(self)
+        self.name = name
         self.private_name = '_' + name
 
     def __get__(self, obj, objtype=None):
@@ -125,6 +205,10 @@ class DatasetDescriptor(ABC):
     def calculate_description(self, obj):
         pass
 
+    def update_description(self, obj, change):
+        """Returns the description updated for a change of the data (e.g. a ListChange), None means that it will be recomputed (the default)."""
+        return None
+
 # Cell
 class StringDescriptor:
     """Descriptor for strings"""
@@ -139,8 +223,9 @@ class StringDescriptor:
 
 # Cell
 class GenericDataset:
-    """A generic datset that has a name and description. Data is stored under the attribute base_data. The class provides a function `reset_infered_data` which can be called to reset all descriptors."""
-    _descriptors = []
+    """A generic datset that has a name and description. Data is stored under the attribute base_data. The class provides a function `reset_infered_data` which can be called to reset all descriptors.
+    Every dataset class has its own registry of descriptors (_descriptors, by name), which includes the descriptors of the parent classes."""
+    _descriptors = {}
 
     name = StringDescriptor()
     description = StringDescriptor()
@@ -150,7 +235,26 @@ class GenericDataset:
         self.name = name
         self.description = description
 
-    def reset_infered_data(self, new_data=None):
-        """Takes an argument to be compatible with callbacks."""
-        for descriptor in self._descriptors:
-            descriptor.__set__(self, None)
\ No newline at end of file
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._descriptors = {}
+        for klass in reversed(cls.__mro__):
+            cls._descriptors.update({name: value for name, value in vars(klass).items() if isinstance(value, DatasetDescriptor)})
+
+    @classmethod
+    def get_dependent_descriptor_names(cls, descriptor_names):
+        """Returns the names of the given descriptors and of all descriptors that (indirectly) depend on them."""
+        dependent_names = set(descriptor_names)
+        while True:
+            new_names = {name for name, descriptor in cls._descriptors.items() if name not in dependent_names and len(dependent_names.intersection(descriptor.depends_on)) > 0}
+            if len(new_names) == 0:
+                return dependent_names
+            dependent_names.update(new_names)
+
+    def reset_infered_data(self, new_data=None, descriptor_names=None):
+        """Takes an argument to be compatible with callbacks. Resets the given descriptors (all if None) and the descriptors that depend on them,
+        the other descriptors keep their values."""
+        if descriptor_names is None:
+            descriptor_names = self._descriptors.keys()
+        for name in self.get_dependent_descriptor_names(descriptor_names):
+            self._descriptors[name].__set__(self, None)
\ No newline at end of file
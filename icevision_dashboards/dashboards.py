@@ -30,6 +30,7 @@ from .plotting import *
 from .core.data import *
 from .data import *
 from .plotting.utils import toggle_legend_js
+from .metrics import ClassConfusionMatrix, ClassConfusionMatrixInstanceSegmentation
 
 # Cell
 class ObjectDetectionDatasetOverview(DatasetOverview):
@@ -227,6 +228,8 @@ class ObjectDetectionDatasetGeneratorRange(DatasetGenerator):
 # Cell
 class ObjectDetectionResultOverview(Dashboard):
     """Result dashboard for instance segmentation results. Init tasks an InstanceSegmentationResultDataset"""
+    CONFUSION_MATRIX = ClassConfusionMatrix
+
     def __init__(self, dataset, height=700, width=1000):
         self.dataset= dataset
         self.accordion_active = [0]
@@ -236,7 +239,8 @@ class ObjectDetectionResultOverview(Dashboard):
     def build_gui(self):
         self.loss_tab = self.build_loss_tab()
         self.ap_tab = self.build_precision_recall_tab()
-        self.gui = pn.Tabs(("Loss", self.loss_tab), ("Precision-Recall", self.ap_tab))
+        self.confusion_matrix_tab = self.build_confusion_matrix_tab()
+        self.gui = pn.Tabs(("Loss", self.loss_tab), ("Precision-Recall", self.ap_tab), ("Confusion Matrix", self.confusion_matrix_tab))
 
     def show(self):
         return self.gui
@@ -247,6 +251,9 @@ class ObjectDetectionResultOverview(Dashboard):
     def show_ap_tab(self):
         return self.ap_tab
 
+    def show_confusion_matrix_tab(self):
+        return self.confusion_matrix_tab
+
     @staticmethod
     def generate_grid_coodinates(num_centers, center_spacer_ratio=3.5):
         num_spacers = num_centers+1
@@ -310,15 +317,15 @@ class ObjectDetectionResultOverview(Dashboard):
         return pn.Column(loss_hists_col, sub_tabs)
 
     def build_ap_overview(self, metric_data):
-        map_data = {key: [metric_data[key]["map"], int(len(metric_data[key].keys())-1)] for key in metric_data.keys()}
-        map_table = table_from_dataframe(pd.DataFrame(map_data, index=["mAP", "Classes"]).round(4))
+        map_data = {key: [metric_data[key]["map"], metric_data[key]["mar"], len([class_name for class_name in metric_data[key].keys() if class_name not in ["map", "mar"]])] for key in metric_data.keys()}
+        map_table = table_from_dataframe(pd.DataFrame(map_data, index=["mAP", "mAR", "Classes"]).round(4))
 
         ap_data = {}
         for metric_key, metric_value in metric_data.items():
             if metric_key != "map":
                 ap_data[metric_key] = {"class": [], "ap": []}
                 for class_name, class_data in metric_value.items():
-                    if class_name != "map":
+                    if class_name not in ["map", "mar"]:
                         ap_data[metric_key]["class"].append(class_name)
                         ap_data[metric_key]["ap"].append(class_data["ap"])
         ap_plots = []
@@ -354,9 +361,9 @@ class ObjectDetectionResultOverview(Dashboard):
         row_coords = self.generate_grid_coodinates(2)[::-1]
         col_coords = self.generate_grid_coodinates(5)
         coord_combinations = list(itertools.product(row_coords, col_coords))
-        ious = sorted([iou for iou in data.keys() if iou != "ap"])
+        ious = sorted([iou for iou in data.keys() if iou not in ["ap", "ar"]])
         for index, iou in enumerate(ious):
-            if iou != "ap":
+            if iou not in ["ap", "ar"]:
                 row_coord = coord_combinations[index][0]
                 col_coord = coord_combinations[index][1]
                 self.precision_recall_plot_matplotlib(fig, data[iou], iou, row_coord[0], row_coord[1], col_coord[0], col_coord[1])
@@ -398,7 +405,7 @@ class ObjectDetectionResultOverview(Dashboard):
 
     def plot_additional_stats_matplotlib(self, class_data, class_name):
         # histograms
-        ious = sorted([iou for iou in class_data.keys() if iou != "ap"])
+        ious = sorted([iou for iou in class_data.keys() if iou not in ["ap", "ar"]])
         iou_selector = pnw.Select(name="IOU", options=ious, value=0.5)
 
         @pn.depends(iou_selector.param.value)
@@ -406,6 +413,9 @@ class ObjectDetectionResultOverview(Dashboard):
             nonlocal class_data
             nonlocal self
             data = class_data[iou]
+            # the additional stats are missing if they were skipped for the metric calculation
+            if data.get("center_distances", None) is None:
+                return pn.Column("<h1> No information available</h1>")
             fig = plt.figure(constrained_layout=False, figsize=(16,9))
             row_coords = self.generate_grid_coodinates(3)[::-1]
             col_coords = self.generate_grid_coodinates(4)[::-1]
@@ -427,15 +437,17 @@ class ObjectDetectionResultOverview(Dashboard):
         return pn.Column(iou_selector, _plot_additional_stats_matplotlib)
 
     def build_precison_recall_overview(self, data):
-        if len(data) == 1:
+        class_names = [key for key in data.keys() if key not in ["map", "mar"]]
+        if len(class_names) == 0:
             return pn.Column("<h1> No information available</h1>")
-        class_select = pnw.Select(options=[key for key in data.keys() if key != "map"])
+        class_select = pnw.Select(options=class_names)
         @pn.depends(class_select.param.value)
         def _plot(class_name):
             heading = pn.Row("<h1>AP - "+str(data[class_name]["ap"].round(4))+"</h1>", align="center")
-            table_data = {"AP": [round(data[class_name][iou_key]["ap"],4) for iou_key in data[class_name].keys() if iou_key != "ap"]}
+            iou_keys = [iou_key for iou_key in data[class_name].keys() if iou_key not in ["ap", "ar"]]
+            table_data = {"AP": [round(data[class_name][iou_key]["ap"],4) for iou_key in iou_keys], "AR": [round(data[class_name][iou_key]["ar"],4) for iou_key in iou_keys]}
             table_df = pd.DataFrame(table_data).T
-            table_df.columns = [iou_key for iou_key in data[class_name].keys() if iou_key != "ap"]
+            table_df.columns = iou_keys
             table_df.index.names = ["iou"]
             overview_table = table_from_dataframe(table_df)
             precision_recall_curves = self.plot_precision_recall_curves_for_class_matplotlib(data[class_name], class_name)
@@ -453,6 +465,25 @@ class ObjectDetectionResultOverview(Dashboard):
 
         return pn.Tabs(("Overview", overview_tab), ("AP", ap_tab), ("AP_small", ap_small_tab), ("AP_medium", ap_medium_tab), ("AP_large", ap_large_tab))
 
+    def build_confusion_matrix_tab(self):
+        # the ious are calculated once, changing the thresholds only redoes the matching
+        confusion_matrix = self.CONFUSION_MATRIX(self.dataset.base_data)
+        iou_slider = pnw.FloatSlider(name="IOU", start=0.05, end=0.95, step=0.05, value=0.5)
+        score_slider = pnw.FloatSlider(name="Score", start=0, end=1, step=0.05, value=0.5)
+        normalize_select = pnw.Select(name="Normalize", options=["None", "Row", "Column"], value="None")
+        plot_size = floor(min(self.width, self.height)*0.8)
+
+        @pn.depends(iou_slider.param.value, score_slider.param.value, normalize_select.param.value)
+        def _plot_confusion_matrix(iou, score, normalize):
+            heatmap_data = confusion_matrix.get_heatmap_data(iou, score)
+            return heatmap(heatmap_data, "prediction", "gt", "count", normalize=normalize, width=plot_size, height=plot_size)
+
+        return pn.Column(
+            pn.Row(iou_slider, score_slider, normalize_select, align="center"),
+            pn.Row("<b>Ground truth (rows) vs. prediction (columns)</b>", align="center"),
+            pn.Row(_plot_confusion_matrix, align="center")
+        )
+
 # Cell
 class InstanceSegmentationDatasetOverview(ObjectDetectionDatasetOverview):
     pass
@@ -478,6 +509,8 @@ class InstanceSegmentationDatasetGeneratorRange(DatasetGenerator):
 # Cell
 class InstanceSegmentationResultOverview(ObjectDetectionResultOverview):
     """Result dashboard for instance segmentation results. Init tasks an InstanceSegmentationResultDataset"""
+    CONFUSION_MATRIX = ClassConfusionMatrixInstanceSegmentation
+
     def build_loss_tab(self):
         # loss hists
         fig_loss_hists, ax_loss_hists = plt.subplots(1, len(self.loss_keys), figsize=(16*5,9))
@@ -554,7 +587,7 @@ class InstanceSegmentationResultOverview(ObjectDetectionResultOverview):
 
     def plot_additional_stats_matplotlib(self, class_data, class_name):
         # histograms
-        ious = sorted([iou for iou in class_data.keys() if iou != "ap"])
+        ious = sorted([iou for iou in class_data.keys() if iou not in ["ap", "ar"]])
         iou_selector = pnw.Select(name="IOU", options=ious, value=0.5)
 
         @pn.depends(iou_selector.param.value)
@@ -562,6 +595,9 @@ class InstanceSegmentationResultOverview(ObjectDetectionResultOverview):
             nonlocal class_data
             nonlocal self
             data = class_data[iou]
+            # the additional stats are missing if they were skipped for the metric calculation
+            if data.get("center_distances", None) is None:
+                return pn.Column("<h1> No information available</h1>")
             fig = plt.figure(constrained_layout=False, figsize=(16,9))
             row_coords = self.generate_grid_coodinates(3)[::-1]
             col_coords = self.generate_grid_coodinates(4)[::-1]
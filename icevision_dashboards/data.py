@@ -1,22 +1,27 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/data.ipynb (unless otherwise specified).
 
-__all__ = ['RecordDataframeParser', 'RecordDataset', 'ResultsDataset', 'BboxRecordDataframeParser',
-           'DataDescriptorBbox', 'StatsDescriptorBbox', 'ImageStatsDescriptorBbox', 'ClassStatsDescriptorBbox',
-           'GalleryStatsDescriptorBbox', 'BboxRecordDataset', 'PrecisionRecallMetricsDescriptorObjectDetection',
-           'ObjectDetectionResultsDataset', 'InstanceSegmentationRecordDataframeParser',
-           'DataDescriptorInstanceSegmentation', 'StatsDescriptorInstanceSegmentation',
-           'ImageStatsDescriptorInstanceSegmentation', 'ClassStatsDescriptorInstanceSegmentation',
-           'GalleryStatsDescriptorInstanceSegmentation', 'InstanceSegmentationRecordDataset',
-           'PrecisionRecallMetricsDescriptorInstanceSegmentation', 'InstanceSegmentationResultsDataset']
+__all__ = ['FileMetadataScanner', 'RecordDataframeParser', 'LazyRecordList', 'RecordDataset', 'RecordDataDescriptor',
+           'ResultsDataset', 'BboxRecordDataframeParser', 'DataDescriptorBbox', 'StatsDescriptorBbox',
+           'ImageStatsDescriptorBbox', 'ClassStatsDescriptorBbox', 'GalleryStatsDescriptorBbox', 'BboxRecordDataset',
+           'PrecisionRecallMetricsDescriptorObjectDetection', 'ObjectDetectionResultsDataset',
+           'InstanceSegmentationRecordDataframeParser', 'DataDescriptorInstanceSegmentation',
+           'StatsDescriptorInstanceSegmentation', 'ImageStatsDescriptorInstanceSegmentation',
+           'ClassStatsDescriptorInstanceSegmentation', 'GalleryStatsDescriptorInstanceSegmentation',
+           'InstanceSegmentationRecordDataset', 'PrecisionRecallMetricsDescriptorInstanceSegmentation',
+           'InstanceSegmentationResultsDataset', 'ResultsAccumulator']
 
 # Cell
 import datetime
 from typing import Union, Optional, List
 import os
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from random import shuffle
-from abc import ABC
+from collections.abc import MutableSequence
+from abc import ABC, abstractmethod
+from joblib import delayed, Parallel, effective_n_jobs
 
 import numpy as np
 import pandas as pd
@@ -37,46 +42,200 @@ from pycocotools import mask as mask_utils
 from fastprogress import master_bar, progress_bar
 
 from .plotting.utils import draw_record_with_bokeh
-from .metrics import APObjectDetection, APInstanceSegmentation
+from .metrics import APObjectDetection, APInstanceSegmentation, APObjectDetectionAccumulator, APInstanceSegmentationAccumulator, MetricDataCache
 from .core.data import *
-from .utils import erles_to_counts_to_utf8, erles_to_string, string_to_erles, correct_mask, decorrect_mask
+from .utils import erles_to_counts_to_utf8, erles_to_string, string_to_erles, erles_to_areas, correct_mask, decorrect_mask, save_dataframe_as_npz, load_dataframe_from_npz, load_encoded_dataframe_from_npz, compact_dataframe, expand_dataframe, memory_usage_report
+
+# Cell
+class FileMetadataScanner:
+    """Reads the creation and modification dates of the image files with one os.stat per file (not per annotation). The files are read on every call, so the dates of changed files
+    are always up to date and the scanner has no state (it can be shared by datasets and is the same in joblib workers). With n_threads > 1 the files are read in a thread pool,
+    which hides the latency of network file systems. With include_dates=False no file is read and all dates are NaT. The creation time is not necessarily the real creation time.
+    This depends on the OS, for more information see: https://docs.python.org/3/library/os.html#os.stat_result."""
+    def __init__(self, n_threads=1, include_dates=True):
+        self.n_threads = n_threads
+        self.include_dates = include_dates
+
+    @staticmethod
+    def read_dates(filepath):
+        file_stats = os.stat(filepath)
+        return datetime.datetime.fromtimestamp(file_stats.st_ctime), datetime.datetime.fromtimestamp(file_stats.st_mtime)
+
+    def scan(self, filepaths):
+        """Returns the creation and modification dates of filepaths (without duplicates)."""
+        if self.n_threads > 1 and len(filepaths) > 1:
+            with ThreadPoolExecutor(max_workers=self.n_threads) as pool:
+                return list(pool.map(self.read_dates, filepaths))
+        return [self.read_dates(filepath) for filepath in filepaths]
+
+    def get_dates(self, filepaths):
+        """Returns the creation dates and modification dates for every entry of filepaths (e.g. the filepath of every annotation)."""
+        codes, unique_filepaths = pd.factorize(np.array([str(filepath) for filepath in filepaths], dtype=object))
+        if not self.include_dates:
+            no_dates = pd.to_datetime([pd.NaT]*len(codes))
+            return no_dates, no_dates
+        dates = self.scan(list(unique_filepaths))
+        creation_dates = pd.to_datetime([creation_date for creation_date, _ in dates])
+        modification_dates = pd.to_datetime([modification_date for _, modification_date in dates])
+        return creation_dates.take(codes), modification_dates.take(codes)
 
 # Cell
 class RecordDataframeParser(parsers.Parser):
-    """IceVision parser for pandas dataframes. This parser is mostly used by the RecordDataset to load records from a saved RecordDataset."""
+    """IceVision parser for pandas dataframes. This parser is mostly used by the RecordDataset to load records from a saved RecordDataset.
+    The rows of every image (filepath, sorted like a groupby) are found with one sort of the dataframe, the parser iterates over the row positions of the images
+    and the fields are read from slices of the columns as numpy arrays."""
     def __init__(self, record_template):
         super().__init__(record_template)
 
     def __iter__(self):
-        for group in self.record_dataframe.groupby("filepath"):
-            yield group[1]
+        self.columns = {}
+        codes, _ = pd.factorize(self.record_dataframe["filepath"].astype(str), sort=True)
+        row_order = np.argsort(codes, kind="stable")
+        # rows without a filepath are skipped like in a groupby
+        row_order = row_order[codes[row_order] >= 0]
+        if len(row_order) == 0:
+            return
+        yield from np.split(row_order, np.flatnonzero(np.diff(codes[row_order]))+1)
 
     def __len__(self):
-        return self.record_dataframe["filepath"].nunique
+        return self.record_dataframe["filepath"].nunique()
+
+    def get_column(self, name):
+        """Returns the column as numpy array, every column is converted once per parse."""
+        if name not in self.columns:
+            self.columns[name] = self.record_dataframe[name].to_numpy()
+        return self.columns[name]
 
     def record_id(self, o):
-        return o.iloc[0]["id"]
+        return self.get_column("id")[o[0]]
 
     def parse_fields(self, o, record, is_new):
-        width, height = o.iloc[0]["width"], o.iloc[0]["height"]
-        record.set_filepath(o.iloc[0]["filepath"])
+        width, height = self.get_column("width")[o[0]], self.get_column("height")[o[0]]
+        record.set_filepath(self.get_column("filepath")[o[0]])
         record.set_img_size((width, height))
         record.detection.set_class_map(self.class_map)
-        record.detection.add_labels(o["label"])
+        record.detection.add_labels(self.get_column("label")[o].tolist())
+
+    def get_bboxes(self, o):
+        """Returns the BBoxes of the rows o."""
+        return [BBox(*bbox) for bbox in zip(*[self.get_column(name)[o].tolist() for name in ["bbox_xmin", "bbox_ymin", "bbox_xmax", "bbox_ymax"]])]
+
+# Cell
+class LazyRecordList(MutableSequence):
+    """List of records that are parsed from the rows of a record dataframe (rows with the same record_index form one record) the first time they are accessed.
+    A record is parsed with parse_df_to_records(rows, class_map, show_pbar=False, autofix=False), the encoded_strings (dict of EncodedStrings with one entry per row,
+    e.g. the RLEs) are added to its rows.
+    Adding records doesn't parse any records, removing or replacing records parses the affected ones (e.g. to pass them to the change callbacks of an ObservableList)
+    and sort or the sum with other lists parse all records."""
+    def __init__(self, record_data_df, parse_df_to_records, class_map, encoded_strings=None):
+        self.record_data_df = record_data_df
+        self.parse_df_to_records = parse_df_to_records
+        self.class_map = class_map
+        self.encoded_strings = {} if encoded_strings is None else encoded_strings
+        self.row_order = np.argsort(record_data_df["record_index"].to_numpy(), kind="stable")
+        record_indices = record_data_df["record_index"].to_numpy()[self.row_order]
+        starts = np.flatnonzero(np.r_[True, record_indices[1:] != record_indices[:-1]]) if len(record_indices) > 0 else np.zeros(0, dtype=int)
+        # not parsed records are stored as slices of the row_order
+        self._items = [slice(start, end) for start, end in zip(starts, np.r_[starts[1:], len(record_indices)])]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[item_index] for item_index in range(len(self))[index]]
+        item = self._items[index]
+        if isinstance(item, slice):
+            # the saved rows come from records that were already fixed, the progress bars of the parsing and autofix would be shown for every record
+            item = self.parse_df_to_records(self.get_record_rows(self.row_order[item]), self.class_map, show_pbar=False, autofix=False)[0]
+            self._items[index] = item
+        return item
+
+    def __setitem__(self, index, value):
+        self._items[index] = value
+
+    def __delitem__(self, index):
+        del self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return "LazyRecordList(num_records="+str(len(self))+", num_parsed="+str(sum(not isinstance(item, slice) for item in self._items))+")"
+
+    def insert(self, index, value):
+        self._items.insert(index, value)
+
+    def get_record_rows(self, rows, include_encoded_strings=True):
+        """Returns the rows (positions in the record dataframe) with the decoded strings of these rows."""
+        record_rows = self.record_data_df.iloc[rows].reset_index(drop=True)
+        if include_encoded_strings:
+            for name, strings in self.encoded_strings.items():
+                record_rows[name] = strings[rows]
+        return record_rows
+
+    def get_unparsed_rows(self):
+        """Returns the row positions of the records that weren't parsed yet in the record dataframe and the position of their record in the list (one per row)."""
+        unparsed_items = [(position, item) for position, item in enumerate(self._items) if isinstance(item, slice)]
+        if len(unparsed_items) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        positions = np.array([position for position, _ in unparsed_items])
+        starts, lengths = np.array([item.start for _, item in unparsed_items]), np.array([item.stop-item.start for _, item in unparsed_items])
+        # positions of the rows in the row_order: start of the item + offset inside of the item
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths)-lengths, lengths)
+        return self.row_order[np.repeat(starts, lengths)+offsets], np.repeat(positions, lengths)
+
+    def get_parsed_records(self):
+        """Returns the records that were parsed (or added) and their positions in the list."""
+        parsed_items = [(position, item) for position, item in enumerate(self._items) if not isinstance(item, slice)]
+        return [item for _, item in parsed_items], np.array([position for position, _ in parsed_items], dtype=int)
+
+    def sort(self, key=None, reverse=False):
+        self._items = sorted(self, key=key, reverse=reverse)
 
 # Cell
 class RecordDataset(GenericDataset, ABC):
-    """Base class dashboard datasets that are based on IceVision records."""
-    def __init__(self, records: Union[List[BaseRecord], ObservableList, str], class_map, name=None, description=None):
+    """Base class dashboard datasets that are based on IceVision records.
+    The dates of the image files are read with the file_metadata_scanner (e.g. set it to FileMetadataScanner(n_threads=16) for network file systems).
+    With n_jobs != 1 the data descriptor processes shards of the records in a joblib pool with the given backend (n_jobs=-1 uses all cores).
+    With compact_data the data is stored as compact dataframe (see compact_dataframe, float columns are only rounded to float32 with allow_float32_rounding),
+    the memory usage before and after the compaction is in the data_memory_report (updated with the data).
+    Changes of the records update the infered data; use `with dataset.records.batch():` for many changes to update it only once.
+    A saved dataset (path as records) can be loaded lazy: the data is memory-mapped (npz files), all stats are calculated from it and the records are only parsed when they are accessed.
+    The string columns without repeated values of lazy npz datasets (e.g. the RLEs) are not part of the data, they are only decoded for the parsed records and when the dataset is saved."""
+    file_metadata_scanner = FileMetadataScanner()
+    n_jobs = 1
+    backend = "loky"
+    compact_data = False
+    allow_float32_rounding = False
+    data_memory_report = None
+
+    def __init__(self, records: Union[List[BaseRecord], ObservableList, str], class_map, name=None, description=None, lazy=False):
+        self.reset_infered_data()
         if isinstance(records, str):
-            self.load_from_file(records)
+            self.load_from_file(records, lazy)
         else:
             if isinstance(records, icevision.data.record_collection.RecordCollection):
                 records = records._records._list
             self.records = records if isinstance(records, ObservableList) else ObservableList(records)
             self.class_map = class_map
         super().__init__(self.records, name=name, description=description)
-        self.records.register_callback(self.reset_infered_data)
+        self.records.register_change_callback(self.update_infered_data)
+
+    def update_infered_data(self, records, change):
+        """Callback for the changes of the records. Every descriptor that is calculated from the records can update its value for the change (see DatasetDescriptor.update_description),
+        the descriptors that depend on them are reset. Changes of other lists (e.g. the sum of two datasets) reset all descriptors."""
+        if records is not self.records or change is None:
+            self.reset_infered_data()
+            return
+        base_descriptors = {name: descriptor for name, descriptor in self._descriptors.items() if len(descriptor.depends_on) == 0}
+        updated_values = {descriptor.private_name: descriptor.update_description(self, change) for descriptor in base_descriptors.values()}
+        self.reset_infered_data(descriptor_names=base_descriptors.keys())
+        for private_name, value in updated_values.items():
+            setattr(self, private_name, value)
 
     def __repr__(self):
         base_string = ""
@@ -121,37 +280,62 @@ class RecordDataset(GenericDataset, ABC):
         return cls(records, class_map=class_map, name=name, description=description)
 
     @staticmethod
-    def parse_df_to_records(record_data_df):
+    def parse_df_to_records(record_data_df, class_map, show_pbar=True, autofix=True):
         raise NotImplementedError()
 
-    def load_from_file(self, path):
-        data = json.load(open(path))
-        df = pd.DataFrame(data["data"])
+    def load_from_file(self, path, lazy=False):
+        """Loads a dataset saved with save, the format is infered from the file extension (.npz, else json).
+        With lazy the saved data is used as data (memory-mapped for npz files, a compact copy with compact_data) and the records are parsed when they are accessed (see LazyRecordList),
+        the records keep the saved order instead of being sorted by filepath."""
+        encoded_strings = None
+        if path.endswith(".npz") and lazy:
+            df, encoded_strings, data = load_encoded_dataframe_from_npz(path, mmap=True)
+        elif path.endswith(".npz"):
+            df, data = load_dataframe_from_npz(path)
+        else:
+            data = json.load(open(path))
+            df = pd.DataFrame(data["data"])
         self.class_map = ClassMap(data["class_map"])
         self._name = data["name"]
         self._description = data["description"]
-        records = self.parse_df_to_records(df, self.class_map)
-        self.records = ObservableList(records)
-
-    def save(self, save_path):
+        if lazy:
+            # the record_index of the saved data can have gaps (records without annotations aren't saved)
+            df["record_index"] = np.unique(df["record_index"].to_numpy(), return_inverse=True)[1].reshape(-1)
+            self.records = ObservableList(LazyRecordList(df, self.parse_df_to_records, self.class_map, encoded_strings))
+            # the record dataframe of the list stays uncompacted, it is used to parse the records
+            self._data = df
+            if self.compact_data:
+                self._data = compact_dataframe(df, self.allow_float32_rounding)
+                self.data_memory_report = memory_usage_report(expand_dataframe(df), self._data)
+        else:
+            records = self.parse_df_to_records(df, self.class_map)
+            self.records = ObservableList(records)
+
+    def save(self, save_path, file_format="json"):
+        """Saves the data of the dataset in save_path and returns the path of the file. The file_format can be json or npz,
+        npz stores the columns with their dtypes (see save_dataframe_as_npz) and is much faster to save and load for large datasets."""
+        if file_format not in ["json", "npz"]:
+            raise ValueError("file_format needs to be json or npz, not "+str(file_format))
         if not os.path.isdir(save_path):
             os.makedirs(save_path, exist_ok=True)
-        save_name = "dataset" if self.name == "" or self.name is None else self.name
-        if not os.path.isfile(os.path.join(save_path, save_name+".json")):
-            save_name = save_name+".json"
+        base_name = "dataset" if self.name == "" or self.name is None else self.name
+        save_name = base_name+"."+file_format
+        counter = 1
+        while os.path.isfile(os.path.join(save_path, save_name)):
+            save_name = base_name+"("+str(counter)+")."+file_format
+            counter += 1
+
+        data = self.data
+        if isinstance(self.records.list, LazyRecordList) and len(self.records.list.encoded_strings) > 0:
+            # the data of lazy datasets doesn't contain the encoded string columns
+            data = self._descriptors["data"].calculate_lazy_description(self, self.records.list, include_encoded_strings=True)
+        class_map = self.class_map if self.class_map is not None else self.create_class_map_from_record_df(data)
+        if file_format == "npz":
+            save_dataframe_as_npz(os.path.join(save_path, save_name), data, {"name": self.name, "description": self.description, "class_map": class_map._id2class})
         else:
-            counter = 1
-            while True:
-                save_name = save_name+"("+str(counter)+").json"
-                if os.path.isfile(os.path.join(save_path, save_name)):
-                    counter += 1
-                else:
-                    break
-
-        class_map = self.class_map if self.class_map is not None else self.create_class_map_from_record_df(self.data)
-        save_data = {"name": self.name, "description": self.description, "data": self.data.to_dict(), "class_map": class_map._id2class}
-
-        json.dump(save_data, open(os.path.join(save_path, save_name), "w"), default=str)
+            save_data = {"name": self.name, "description": self.description, "data": data.to_dict(), "class_map": class_map._id2class}
+            json.dump(save_data, open(os.path.join(save_path, save_name), "w"), default=str)
+        return os.path.join(save_path, save_name)
 
     def get_image_by_index(self, index, width, height):
         return draw_record_with_bokeh(self[index], class_map=self.class_map, width=None, height=height, return_figure=True)
@@ -159,18 +343,95 @@ class RecordDataset(GenericDataset, ABC):
     @classmethod
     def create_new_from_mask(cls, cls_instance, mask):
         selection = cls_instance.data[mask]
-        filepaths = np.unique(selection["filepath"]).tolist()
-        new_records = [record for record in cls_instance.records if str(record.filepath) in filepaths]
+        # the record_index is the position of the record, so only the selected records are accessed (and parsed for lazy datasets)
+        new_records = [cls_instance.records[record_index] for record_index in np.unique(selection["record_index"])]
         return cls(new_records, cls_instance.class_map)
 
+# Cell
+class RecordDataDescriptor(DatasetDescriptor):
+    """Base class for the data descriptors of the RecordDatasets, calculate_records_description aggregates a list of records into a dataframe.
+    With n_jobs != 1 on the dataset the records are split into shards (SHARDS_PER_JOB per worker to balance the load), which are processed in a joblib pool
+    with the backend of the dataset. The partial dataframes are concatenated in the order of the records.
+    The records of a LazyRecordList aren't parsed, the rows of the records that weren't parsed yet are taken from its record dataframe."""
+    SHARDS_PER_JOB = 4
+
+    def calculate_description(self, obj):
+        if isinstance(obj.records.list, LazyRecordList):
+            data = self.calculate_lazy_description(obj, obj.records.list)
+        else:
+            records = list(obj.records)
+            n_jobs = min(effective_n_jobs(obj.n_jobs), len(records))
+            if n_jobs <= 1:
+                data = self.calculate_records_description(records, obj.class_map, obj.file_metadata_scanner)
+            else:
+                shard_starts = np.linspace(0, len(records), min(n_jobs*self.SHARDS_PER_JOB, len(records))+1).astype(int)
+                shard_data = Parallel(n_jobs=n_jobs, backend=obj.backend)(
+                    delayed(self.calculate_records_description)(records[start:end], obj.class_map, obj.file_metadata_scanner, start)
+                    for start, end in zip(shard_starts[:-1], shard_starts[1:])
+                )
+                data = pd.concat(shard_data, ignore_index=True)
+        if obj.compact_data:
+            compact_data = compact_dataframe(data, obj.allow_float32_rounding)
+            obj.data_memory_report = memory_usage_report(data, compact_data)
+            data = compact_data
+        return data
+
+    def calculate_lazy_description(self, obj, records, include_encoded_strings=False):
+        """Returns the dataframe for a LazyRecordList without parsing any records: the rows of the records that weren't parsed yet are taken from the record dataframe of the list
+        (with the encoded string columns if include_encoded_strings), only the parsed and added records are calculated. The result has the columns of the record dataframe."""
+        rows, row_positions = records.get_unparsed_rows()
+        data = [records.get_record_rows(rows, include_encoded_strings).assign(record_index=row_positions)]
+        parsed_records, positions = records.get_parsed_records()
+        if len(parsed_records) > 0:
+            parsed_data = self.calculate_records_description(parsed_records, obj.class_map, obj.file_metadata_scanner)
+            parsed_data["record_index"] = positions[parsed_data["record_index"].to_numpy(dtype=int)]
+            data.append(parsed_data[list(data[0].columns)])
+        data = pd.concat([part for part in data if len(part) > 0] or data[:1], ignore_index=True)
+        return data.sort_values("record_index", kind="stable", ignore_index=True)
+
+    def update_description(self, obj, change):
+        """Patches the dataframe for a ListChange of the records: the rows of the removed records are dropped, the rows of the added records are calculated
+        and the record_index of the following rows is shifted, so the result is the same as a recomputation."""
+        data = getattr(obj, self.private_name, None)
+        if data is None or change.kind == "reset":
+            return None
+        record_indices = data["record_index"].to_numpy()
+        following_rows = data[record_indices >= change.index+len(change.removed)].copy()
+        # the record_index can be downcast in compact frames
+        following_rows["record_index"] = following_rows["record_index"].astype(int)+len(change.added)-len(change.removed)
+        added_rows = self.calculate_records_description(change.added, obj.class_map, obj.file_metadata_scanner, change.index) if len(change.added) > 0 else None
+        if added_rows is not None and isinstance(obj.records.list, LazyRecordList):
+            # the data of lazy datasets doesn't contain the encoded string columns
+            added_rows = added_rows[list(data.columns)]
+        # records without annotations have no rows, empty frames would change the dtypes of the concatenation
+        new_data = [data[record_indices < change.index]] + ([added_rows] if added_rows is not None and len(added_rows) > 0 else []) + [following_rows]
+        new_data = pd.concat(new_data, ignore_index=True)
+        if not obj.compact_data:
+            return new_data
+        # categoricals with different categories are concatenated as strings, the report compares with the default dtypes
+        compact_data = compact_dataframe(new_data, obj.allow_float32_rounding)
+        obj.data_memory_report = memory_usage_report(expand_dataframe(new_data), compact_data)
+        return compact_data
+
+    @abstractmethod
+    def calculate_records_description(self, records, class_map, file_metadata_scanner, start_index=0):
+        """Returns the dataframe for the records, the record_index starts at start_index (for shards of the records)."""
+        pass
+
 # Cell
 class ResultsDataset(GenericDataset):
-    """Dashboard dataset for the results of and object detection system."""
+    """Dashboard dataset for the results of and object detection system.
+    With a metric_cache (e.g. MetricDataCache(cache_dir), disabled by default) the computed metric data is stored on disk, so it only needs to be computed once for the same results.
+    The cache entries are pickle files, so only use cache directories that no one else can write to.
+    The dates of the image files are read with the file_metadata_scanner."""
     metric_data_ap = None
     df_parser = None
+    ap_accumulator = None
+    file_metadata_scanner = FileMetadataScanner()
 
-    def __init__(self, dataframe, name=None, description=None):
+    def __init__(self, dataframe, name=None, description=None, metric_cache=None):
         super().__init__(dataframe, name, description)
+        self.metric_cache = metric_cache
         # instanciate metric data and preload it
         self.metric_data_ap = None
         self.class_map = ClassMap([str(i) for i in self.base_data[["label", "label_num"]].drop_duplicates().sort_values("label_num")["label"].tolist()])
@@ -180,6 +441,29 @@ class ResultsDataset(GenericDataset):
             os.makedirs(os.path.join(*path.split("/")[:-1]))
         self.base_data.to_csv(path)
 
+    def get_content_hash(self, *args):
+        """Returns a hash of the base_data and args (e.g. the metric version and ious)."""
+        hasher = hashlib.sha256()
+        hasher.update(json.dumps([str(column) for column in self.base_data.columns]).encode())
+        hasher.update(pd.util.hash_pandas_object(self.base_data, index=True).values.tobytes())
+        for arg in args:
+            hasher.update(repr(arg).encode())
+        return hasher.hexdigest()
+
+    def get_metric_data(self, metric_class, ious, **kwargs):
+        """Returns the metric_data of metric_class (e.g. APObjectDetection) for the base_data and ious.
+        The result is loaded from the metric_cache if it was computed for the same data, ious, settings and metric version before."""
+        if self.metric_cache is None:
+            return metric_class(self.base_data, ious, **kwargs).metric_data
+        # n_jobs, backend and spatial_index_min_boxes don't change the results
+        settings = sorted((key, value) for key, value in kwargs.items() if key not in ["n_jobs", "backend", "spatial_index_min_boxes"])
+        key = self.get_content_hash(metric_class.__name__, metric_class.METRIC_VERSION, [float(iou) for iou in ious], settings)
+        metric_data = self.metric_cache.load(key)
+        if metric_data is None:
+            metric_data = metric_class(self.base_data, ious, **kwargs).metric_data
+            self.metric_cache.save(key, metric_data)
+        return metric_data
+
     def get_image_by_image_id(self, image_id, width=None, height=None):
         """For gallery dashboards"""
         df_pred = self.base_data[(self.base_data["filepath"] == image_id) & (self.base_data["is_prediction"] == True)]
@@ -214,43 +498,61 @@ class BboxRecordDataframeParser(RecordDataframeParser):
 
     def parse_fields(self, o, record, is_new):
         super().parse_fields(o, record, is_new)
-        record.detection.add_bboxes([BBox(annot[1]["bbox_xmin"], annot[1]["bbox_ymin"], annot[1]["bbox_xmax"], annot[1]["bbox_ymax"]) for annot in o.iterrows()])
+        record.detection.add_bboxes(self.get_bboxes(o))
 
 # Cell
-class DataDescriptorBbox(DatasetDescriptor):
+class DataDescriptorBbox(RecordDataDescriptor):
     """Dashboard dataset for object detection"""
-    def calculate_description(self, obj):
+    def calculate_records_description(self, records, class_map, file_metadata_scanner, start_index=0):
         """Aggregates stats from a list of records and returns a pandas dataframe with the aggregated stats. The creation time is not necessarily the real creation time.
-        This depends on the OS, for more information see: https://docs.python.org/3/library/os.html#os.stat_result."""
-        data = []
-        for index,record in enumerate(obj.records):
-            record_commons, record_detections = record.as_dict()["common"], record.aggregate_objects()["detection"]
-            for label, bbox in zip(record_detections["labels"], record_detections["bboxes"]):
-                file_stats = record.filepath.stat()
-                bbox_width = bbox["bbox_width"]
-                bbox_height = bbox["bbox_height"]
-                area = bbox_width*bbox_height
-                area_normalized = area / (record.width * record.height)
-                bbox_ratio = bbox_width / bbox_height
-                data.append(
-                    {
-                        "id": record_commons["record_id"], "width": record.width, "height": record.height, "label": label, "area_square_root": bbox["bbox_sqrt_area"], "area_square_root_normalized": area_normalized**0.5,
-                        "bbox_xmin": bbox["bbox_x"], "bbox_xmax": bbox["bbox_x"]+bbox["bbox_width"], "bbox_ymin": bbox["bbox_y"], "bbox_ymax": bbox["bbox_y"]+bbox["bbox_height"],
-                        "bbox_xmin_normalized": bbox["bbox_x"]/record.width, "bbox_xmax_normalized": (bbox["bbox_x"]+bbox["bbox_width"])/record.width, "bbox_ymin_normalized": bbox["bbox_y"]/record.height,
-                        "bbox_ymax_normalized": (bbox["bbox_y"]+bbox["bbox_height"])/record.height, "area": area, "area_normalized": area_normalized, "bbox_ratio": bbox_ratio, "bbox_ratio_normalized": bbox_ratio*(record.height/record.width),
-                        "record_index": index, "bbox_width": bbox_width, "bbox_height": bbox_height, "bbox_width_normalized": bbox_width/record.width, "bbox_height_normalized": bbox_height/record.height,
-                        "filepath": str(record.filepath), "creation_date": datetime.datetime.fromtimestamp(file_stats.st_ctime), "class_map": json.dumps(record.detection.class_map._id2class),
-                        "modification_date": datetime.datetime.fromtimestamp(file_stats.st_mtime), "num_annotations": len(record_detections["bboxes"])
-                    }
-                )
-        data = pd.DataFrame(data)
+        This depends on the OS, for more information see: https://docs.python.org/3/library/os.html#os.stat_result.
+        The boxes and labels of all records are collected in preallocated arrays and the image attributes once per record, all derived columns are computed per column."""
+        num_annotations = np.array([len(record.detection.bboxes) for record in records], dtype=int)
+        boxes = np.empty((num_annotations.sum(), 4), dtype=float)
+        label_ids = np.empty(num_annotations.sum(), dtype=int)
+        image_data = {"id": [], "width": [], "height": [], "filepath": [], "class_map": []}
+        class_map_strings = {}
+        box_ends = np.cumsum(num_annotations)
+        for record, box_start, box_end in zip(records, box_ends-num_annotations, box_ends):
+            if box_end > box_start:
+                boxes[box_start:box_end] = [bbox.xyxy for bbox in record.detection.bboxes]
+                label_ids[box_start:box_end] = record.detection.label_ids
+            record_class_map = record.detection.class_map
+            if id(record_class_map) not in class_map_strings:
+                class_map_strings[id(record_class_map)] = json.dumps(record_class_map._id2class)
+            image_data["id"].append(record.record_id)
+            image_data["width"].append(record.width)
+            image_data["height"].append(record.height)
+            image_data["filepath"].append(str(record.filepath))
+            image_data["class_map"].append(class_map_strings[id(record_class_map)])
+        image_data["creation_date"], image_data["modification_date"] = file_metadata_scanner.get_dates(image_data["filepath"])
+        record_indices = np.repeat(np.arange(len(records)), num_annotations)
+        image_data = pd.DataFrame(image_data).take(record_indices).reset_index(drop=True)
+
+        width, height = image_data["width"].to_numpy(dtype=float), image_data["height"].to_numpy(dtype=float)
+        bbox_width, bbox_height = boxes[:, 2]-boxes[:, 0], boxes[:, 3]-boxes[:, 1]
+        area = bbox_width*bbox_height
+        area_normalized = area / (width*height)
+        bbox_ratio = bbox_width / bbox_height
+        data = pd.DataFrame({
+            "id": image_data["id"], "width": image_data["width"], "height": image_data["height"], "label": label_ids, "area_square_root": area**0.5, "area_square_root_normalized": area_normalized**0.5,
+            "bbox_xmin": boxes[:, 0], "bbox_xmax": boxes[:, 2], "bbox_ymin": boxes[:, 1], "bbox_ymax": boxes[:, 3],
+            "bbox_xmin_normalized": boxes[:, 0]/width, "bbox_xmax_normalized": boxes[:, 2]/width, "bbox_ymin_normalized": boxes[:, 1]/height,
+            "bbox_ymax_normalized": boxes[:, 3]/height, "area": area, "area_normalized": area_normalized, "bbox_ratio": bbox_ratio, "bbox_ratio_normalized": bbox_ratio*(height/width),
+            "record_index": record_indices+start_index, "bbox_width": bbox_width, "bbox_height": bbox_height, "bbox_width_normalized": bbox_width/width, "bbox_height_normalized": bbox_height/height,
+            "filepath": image_data["filepath"], "creation_date": image_data["creation_date"], "class_map": image_data["class_map"],
+            "modification_date": image_data["modification_date"], "num_annotations": num_annotations[record_indices]
+        })
         data["label_num"] = data["label"]
-        if obj.class_map is not None:
-            data["label"] = data["label"].apply(obj.class_map.get_by_id)
+        if class_map is not None:
+            # every label id is looked up once
+            data["label"] = data["label"].map({label_id: class_map.get_by_id(label_id) for label_id in data["label"].unique()})
         return data
 
 # Cell
 class StatsDescriptorBbox(DatasetDescriptor):
+    depends_on = ["data"]
+
     def calculate_description(self, obj):
         stats_dict = {}
         stats_dict["no_imgs"] = [obj.data["filepath"].nunique()]
@@ -266,6 +568,8 @@ class StatsDescriptorBbox(DatasetDescriptor):
 
 # Cell
 class ImageStatsDescriptorBbox(DatasetDescriptor):
+    depends_on = ["data"]
+
     def calculate_description(self, obj):
         """Creates a dataframe containing stats about the images."""
         stats_dict = {}
@@ -278,10 +582,12 @@ class ImageStatsDescriptorBbox(DatasetDescriptor):
 
 # Cell
 class ClassStatsDescriptorBbox(DatasetDescriptor):
+    depends_on = ["data"]
+
     def calculate_description(self, obj):
         """Creates a dataframe containing stats about the object classes."""
         stats_dict = {}
-        label_group = obj.data.groupby("label")
+        label_group = obj.data.groupby("label", observed=True)
         for label, group in label_group:
             label_stats = {}
             label_stats["imgs"] = group["filepath"].nunique()
@@ -295,6 +601,8 @@ class ClassStatsDescriptorBbox(DatasetDescriptor):
 
 # Cell
 class GalleryStatsDescriptorBbox(DatasetDescriptor):
+    depends_on = ["data"]
+
     def calculate_description(self, obj):
         """Creates a dataframe containing the data for a gallery."""
         df = obj.data[["id", "area", "num_annotations", "label", "bbox_ratio", "bbox_width", "bbox_height", "width", "height"]].drop_duplicates().reset_index(drop=True)
@@ -309,19 +617,16 @@ class BboxRecordDataset(RecordDataset):
     stats_class = ClassStatsDescriptorBbox()
     stats = StatsDescriptorBbox()
 
-    def __init__(self, records: Union[List[BaseRecord], ObservableList, str], class_map=None, name=None, description=None):
-        super().__init__(records, class_map, name, description)
-        self.record_index_image_id_map = {str(record.filepath): index for index, record in enumerate(self.records)}
-        self.data = None
-        self.gallery_data = None
-        self.stats_dataset = None
-        self.stats_image = None
-        self.stats_class = None
-        self.stats = None
+    def __init__(self, records: Union[List[BaseRecord], ObservableList, str], class_map=None, name=None, description=None, lazy=False):
+        super().__init__(records, class_map, name, description, lazy)
+        if isinstance(self.records.list, LazyRecordList):
+            self.record_index_image_id_map = dict(zip(self.data["filepath"].astype(str), self.data["record_index"]))
+        else:
+            self.record_index_image_id_map = {str(record.filepath): index for index, record in enumerate(self.records)}
 
     @staticmethod
-    def parse_df_to_records(record_data_df, class_map):
-        return BboxRecordDataframeParser(record_data_df, class_map).parse(SingleSplitSplitter())[0]
+    def parse_df_to_records(record_data_df, class_map, show_pbar=True, autofix=True):
+        return BboxRecordDataframeParser(record_data_df, class_map).parse(SingleSplitSplitter(), show_pbar=show_pbar, autofix=autofix)[0]
 
     def get_image_by_image_id(self, image_id, width, height):
         index = self.record_index_image_id_map[image_id]
@@ -329,26 +634,48 @@ class BboxRecordDataset(RecordDataset):
 
 # Cell
 class PrecisionRecallMetricsDescriptorObjectDetection(DatasetDescriptor):
-    def __init__(self, ious=None):
+    def __init__(
+        self, ious=None, n_jobs=1, backend="loky", additional_stats=True, max_dets=None, spatial_index_min_boxes=None, evaluation_mode="per_score", area_range_mode="filter"
+    ):
         if ious is None:
             self.ious = np.arange(0.5, 1, 0.05).round(2)
         else:
             self.ious = ious
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.additional_stats = additional_stats
+        self.max_dets = max_dets
+        self.spatial_index_min_boxes = spatial_index_min_boxes
+        self.evaluation_mode = evaluation_mode
+        self.area_range_mode = area_range_mode
 
     def calculate_description(self, obj):
-        return APObjectDetection(obj.base_data, self.ious).metric_data
+        return obj.get_metric_data(
+            APObjectDetection, self.ious, n_jobs=self.n_jobs, backend=self.backend, additional_stats=self.additional_stats, max_dets=self.max_dets,
+            spatial_index_min_boxes=self.spatial_index_min_boxes, evaluation_mode=self.evaluation_mode, area_range_mode=self.area_range_mode
+        )
 
 # Cell
 class ObjectDetectionResultsDataset(ResultsDataset):
     """Dashboard dataset for the results of and object detection system."""
     metric_data_ap = PrecisionRecallMetricsDescriptorObjectDetection()
     df_parser = BboxRecordDataframeParser
+    ap_accumulator = APObjectDetectionAccumulator
 
     @classmethod
     def init_from_preds_and_samples(cls, predictions, samples_plus_losses, padded_along_shortest=True, class_map=None, name=None, description=None):
         """The input_records are required because they are the only information source with the image stats(width, etc.) for the image on the disk."""
+        data = cls.get_dataframe_from_preds_and_samples(predictions, samples_plus_losses, padded_along_shortest, class_map)
+        if not any(data["is_prediction"] == True):
+            raise ValueError("No predictions found.")
+
+        return cls(data, name, description)
+
+    @classmethod
+    def get_dataframe_from_preds_and_samples(cls, predictions, samples_plus_losses, padded_along_shortest=True, class_map=None, start_index=0):
+        """Returns the results dataframe for the predictions and samples, the record_index starts at start_index (for data that is added batch by batch)."""
         data = []
-        for index, (prediction, sample_plus_loss) in enumerate(zip(predictions, samples_plus_losses)):
+        for index, (prediction, sample_plus_loss) in enumerate(zip(predictions, samples_plus_losses), start_index):
             # TODO: At the moment only resize_and_pad or resize are handeled. Check if there are other edge cases that need to be included
             # The correction requires that the sample_plus_loss has the scaled image sizes (not the padded ones or the original ones)
             # correct the width and height to the values of the original image
@@ -371,7 +698,6 @@ class ObjectDetectionResultsDataset(ResultsDataset):
             if len(prediction["labels"]) > 0:
                 for label, bbox, score in zip(prediction["labels"], prediction["bboxes"], prediction["scores"]):
                     xmin, xmax, ymin, ymax = correct_x(bbox.xmin), correct_x(bbox.xmax), correct_y(bbox.ymin), correct_y(bbox.ymax)
-                    file_stats = sample_plus_loss.common.filepath.stat()
                     bbox_width = xmax - xmin
                     bbox_height = ymax - ymin
                     area = bbox_width * bbox_height
@@ -383,8 +709,8 @@ class ObjectDetectionResultsDataset(ResultsDataset):
                             "bbox_xmin_normalized": xmin/width, "bbox_xmax_normalized": xmax/width, "bbox_ymin_normalized": ymin/height, "bbox_ymax_normalized": ymax/height,
                             "area_normalized": area_normalized, "bbox_ratio": bbox_ratio, "bbox_ratio_normalized": bbox_ratio*(height/width), "record_index": index,
                             "bbox_width": bbox_width, "bbox_height": bbox_height, "bbox_width_normalized": bbox_width/width, "bbox_height_normalized": bbox_height/height,
-                            "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": datetime.datetime.fromtimestamp(file_stats.st_ctime),
-                            "modification_date": datetime.datetime.fromtimestamp(file_stats.st_mtime), "num_annotations": len(prediction["bboxes"]), "is_prediction": True,
+                            "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": None,
+                            "modification_date": None, "num_annotations": len(prediction["bboxes"]), "is_prediction": True,
                         }
                     for key, value in losses.items():
                         image_data[key] = value
@@ -393,7 +719,6 @@ class ObjectDetectionResultsDataset(ResultsDataset):
             if len(sample_plus_loss_dict["detection"]["labels"]) > 0:
                 for label, bbox in zip(sample_plus_loss_dict["detection"]["labels"], sample_plus_loss_dict["detection"]["bboxes"]):
                     xmin, xmax, ymin, ymax = correct_x(bbox.xmin), correct_x(bbox.xmax), correct_y(bbox.ymin), correct_y(bbox.ymax)
-                    file_stats = sample_plus_loss.common.filepath.stat()
                     bbox_width = xmax - xmin
                     bbox_height = ymax - ymin
                     area = bbox_width * bbox_height
@@ -405,23 +730,22 @@ class ObjectDetectionResultsDataset(ResultsDataset):
                             "area_normalized": area_normalized, "bbox_ratio": bbox_ratio, "record_index": index,
                             "bbox_xmin_normalized": xmin/width, "bbox_xmax_normalized": xmax/width, "bbox_ymin_normalized": ymin/height, "bbox_ymax_normalized": ymax/height,
                             "bbox_width": bbox_width, "bbox_height": bbox_height,  "bbox_width_normalized": bbox_width/width, "bbox_height_normalized": bbox_height/height,
-                            "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": datetime.datetime.fromtimestamp(file_stats.st_ctime),
-                            "modification_date": datetime.datetime.fromtimestamp(file_stats.st_mtime), "num_annotations": len(prediction["bboxes"]), "is_prediction": False,
+                            "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": None,
+                            "modification_date": None, "num_annotations": len(prediction["bboxes"]), "is_prediction": False,
                         }
                     for key, value in losses.items():
                         image_data[key] = value
                     data.append(image_data)
 
         data = pd.DataFrame(data)
+        # every image file is read once
+        data["creation_date"], data["modification_date"] = cls.file_metadata_scanner.get_dates(data["filepath"])
 
         data["label_num"] = data["label"]
         if class_map is not None:
             data["label_num"] = data["label"].apply(class_map.get_by_name)
 
-        if not any(data["is_prediction"] == True):
-            raise ValueError("No predictions found.")
-
-        return cls(data, name, description)
+        return data
 
 # Cell
 class InstanceSegmentationRecordDataframeParser(RecordDataframeParser):
@@ -433,23 +757,18 @@ class InstanceSegmentationRecordDataframeParser(RecordDataframeParser):
 
     def parse_fields(self, o, record, is_new):
         super().parse_fields(o, record, is_new)
-        bboxes = []
-        masks  = []
-        for annot in o.iterrows():
-            bboxes.append(BBox(annot[1]["bbox_xmin"], annot[1]["bbox_ymin"], annot[1]["bbox_xmax"], annot[1]["bbox_ymax"]))
-            masks.append(EncodedRLEs([string_to_erles(annot[1]["erles_corrected"])]))
-        record.detection.add_bboxes(bboxes)
-        record.detection.add_masks(masks)
+        record.detection.add_bboxes(self.get_bboxes(o))
+        record.detection.add_masks([EncodedRLEs([string_to_erles(erles_string)]) for erles_string in self.get_column("erles_corrected")[o]])
 
 # Cell
-class DataDescriptorInstanceSegmentation(DatasetDescriptor):
+class DataDescriptorInstanceSegmentation(RecordDataDescriptor):
     """Dashboard dataset for object detection"""
-    def calculate_description(self, obj):
+    def calculate_records_description(self, records, class_map, file_metadata_scanner, start_index=0):
         """Aggregates stats from a list of records and returns a pandas dataframe with the aggregated stats. The creation time is not necessarily the real creation time.
         This depends on the OS, for more information see: https://docs.python.org/3/library/os.html#os.stat_result."""
         data = []
         summe = 0
-        for index,record in enumerate(obj.records):
+        for index,record in enumerate(records, start_index):
             record_commons, record_detections = record.as_dict()["common"], record.as_dict()["detection"]
 
             if isinstance(record_detections["masks"][0], EncodedRLEs):
@@ -457,9 +776,11 @@ class DataDescriptorInstanceSegmentation(DatasetDescriptor):
             else:
                 masks_to_iterate_over = record_detections["masks"][0].to_erles(None,None).erles
 
-            for label, bbox, mask in zip(record_detections["labels"], record_detections["bboxes"], masks_to_iterate_over):
-                mask_array = mask_utils.decode([mask])
-                file_stats = record.filepath.stat()
+            # the mask areas are calculated from the RLEs of all masks of the record at once
+            mask_areas, mask_image_sizes = erles_to_areas(masks_to_iterate_over)
+            for label, bbox, mask, mask_area, mask_image_size in zip(record_detections["labels"], record_detections["bboxes"], masks_to_iterate_over, mask_areas, mask_image_sizes):
+                # both erles columns reference the same string
+                erles_string = erles_to_string(mask)
                 area = bbox.width*bbox.height
                 area_normalized = area / (record.width * record.height)
                 bbox_ratio = bbox.width / bbox.height
@@ -471,20 +792,24 @@ class DataDescriptorInstanceSegmentation(DatasetDescriptor):
                         "bbox_xmin_normalized": bbox.xmin/record.width, "bbox_xmax_normalized": (bbox.xmin+bbox.width)/record.width, "bbox_ymin_normalized": bbox.ymin/record.height,
                         "bbox_ymax_normalized": (bbox.ymin+bbox.height)/record.height, "bbox_area": area, "bbox_area_normalized": area_normalized, "bbox_ratio": bbox_ratio, "bbox_ratio_normalized": bbox_ratio*(record.height/record.width),
                         "record_index": index, "bbox_width": bbox.width, "bbox_height": bbox.height, "bbox_width_normalized": bbox.width/record.width, "bbox_height_normalized": bbox.height/record.height,
-                        "filepath": str(record.filepath), "creation_date": datetime.datetime.fromtimestamp(file_stats.st_ctime),
-                        "modification_date": datetime.datetime.fromtimestamp(file_stats.st_mtime), "num_annotations": len(record_detections["bboxes"]),
-                        "erles_corrected": erles_to_string(mask), "erles": erles_to_string(mask), "mask_area": mask_array.sum(), "mask_area_normalized": mask_array.sum()/mask_array.size, "mask_area_normalized_by_bbox_area": mask_array.sum()/area,
+                        "filepath": str(record.filepath), "creation_date": None,
+                        "modification_date": None, "num_annotations": len(record_detections["bboxes"]),
+                        "erles_corrected": erles_string, "erles": erles_string, "mask_area": mask_area, "mask_area_normalized": mask_area/mask_image_size, "mask_area_normalized_by_bbox_area": mask_area/area,
                     }
                 )
 
         data = pd.DataFrame(data)
+        # every image file is read once
+        data["creation_date"], data["modification_date"] = file_metadata_scanner.get_dates(data["filepath"])
         data["label_num"] = data["label"]
-        if obj.class_map is not None:
-            data["label_num"] = data["label"].apply(obj.class_map.get_by_name)
+        if class_map is not None:
+            data["label_num"] = data["label"].apply(class_map.get_by_name)
         return data
 
 # Cell
 class StatsDescriptorInstanceSegmentation(DatasetDescriptor):
+    depends_on = ["data"]
+
     def calculate_description(self, obj):
         stats_dict = {}
         stats_dict["no_imgs"] = [obj.data["filepath"].nunique()]
@@ -507,7 +832,7 @@ class ClassStatsDescriptorInstanceSegmentation(ClassStatsDescriptorBbox):
     def calculate_description(self, obj):
         """Creates a dataframe containing stats about the object classes."""
         stats_dict = {}
-        label_group = obj.data.groupby("label")
+        label_group = obj.data.groupby("label", observed=True)
         for label, group in label_group:
             label_stats = {}
             label_stats["imgs"] = group["filepath"].nunique()
@@ -521,6 +846,8 @@ class ClassStatsDescriptorInstanceSegmentation(ClassStatsDescriptorBbox):
 
 # Cell
 class GalleryStatsDescriptorInstanceSegmentation(DatasetDescriptor):
+    depends_on = ["data"]
+
     def calculate_description(self, obj):
         """Creates a dataframe containing the data for a gallery."""
         df = obj.data[["id", "bbox_area", "num_annotations", "label", "bbox_ratio", "bbox_width", "bbox_height", "mask_area", "mask_area_normalized", "width", "height"]].drop_duplicates().reset_index(drop=True)
@@ -535,19 +862,16 @@ class InstanceSegmentationRecordDataset(RecordDataset):
     stats_class = ClassStatsDescriptorInstanceSegmentation()
     stats = StatsDescriptorInstanceSegmentation()
 
-    def __init__(self, records: Union[List[BaseRecord], ObservableList, str], class_map=None, name=None, description=None):
-        super().__init__(records, class_map, name, description)
-        self.record_index_image_id_map = {str(record.filepath): index for index, record in enumerate(self.records)}
-        self.data = None
-        self.gallery_data = None
-        self.stats_dataset = None
-        self.stats_image = None
-        self.stats_class = None
-        self.stats = None
+    def __init__(self, records: Union[List[BaseRecord], ObservableList, str], class_map=None, name=None, description=None, lazy=False):
+        super().__init__(records, class_map, name, description, lazy)
+        if isinstance(self.records.list, LazyRecordList):
+            self.record_index_image_id_map = dict(zip(self.data["filepath"].astype(str), self.data["record_index"]))
+        else:
+            self.record_index_image_id_map = {str(record.filepath): index for index, record in enumerate(self.records)}
 
     @staticmethod
-    def parse_df_to_records(record_data_df, class_map):
-        return InstanceSegmentationRecordDataframeParser(record_data_df, class_map).parse(SingleSplitSplitter())[0]
+    def parse_df_to_records(record_data_df, class_map, show_pbar=True, autofix=True):
+        return InstanceSegmentationRecordDataframeParser(record_data_df, class_map).parse(SingleSplitSplitter(), show_pbar=show_pbar, autofix=autofix)[0]
 
     def get_image_by_image_id(self, image_id, width, height):
         index = self.record_index_image_id_map[image_id]
@@ -555,20 +879,33 @@ class InstanceSegmentationRecordDataset(RecordDataset):
 
 # Cell
 class PrecisionRecallMetricsDescriptorInstanceSegmentation(DatasetDescriptor):
-    def __init__(self, ious=None):
+    def __init__(
+        self, ious=None, n_jobs=1, backend="loky", additional_stats=True, max_dets=None, spatial_index_min_boxes=None, evaluation_mode="per_score", area_range_mode="filter"
+    ):
         if ious is None:
             self.ious = np.arange(0.5, 1, 0.05).round(2)
         else:
             self.ious = ious
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.additional_stats = additional_stats
+        self.max_dets = max_dets
+        self.spatial_index_min_boxes = spatial_index_min_boxes
+        self.evaluation_mode = evaluation_mode
+        self.area_range_mode = area_range_mode
 
     def calculate_description(self, obj):
-        return APInstanceSegmentation(obj.base_data, self.ious).metric_data
+        return obj.get_metric_data(
+            APInstanceSegmentation, self.ious, n_jobs=self.n_jobs, backend=self.backend, additional_stats=self.additional_stats, max_dets=self.max_dets,
+            spatial_index_min_boxes=self.spatial_index_min_boxes, evaluation_mode=self.evaluation_mode, area_range_mode=self.area_range_mode
+        )
 
 # Cell
 class InstanceSegmentationResultsDataset(ResultsDataset):
     """Dashboard dataset for the results of and object detection system."""
     metric_data_ap = PrecisionRecallMetricsDescriptorInstanceSegmentation()
     df_parser = InstanceSegmentationRecordDataframeParser
+    ap_accumulator = APInstanceSegmentationAccumulator
 
     @staticmethod
     def get_masks_to_iterate_over(prediction):
@@ -586,8 +923,17 @@ class InstanceSegmentationResultsDataset(ResultsDataset):
     @classmethod
     def init_from_preds_and_samples(cls, predictions, samples_plus_losses, padded_along_shortest=True, class_map=None, name=None, description=None):
         """The input_records are required because they are the only information source with the image stats(width, etc.) for the image on the disk."""
+        data = cls.get_dataframe_from_preds_and_samples(predictions, samples_plus_losses, padded_along_shortest, class_map)
+        if not any(data["is_prediction"] == True):
+            raise ValueError("No predictions found.")
+
+        return cls(data, name, description)
+
+    @classmethod
+    def get_dataframe_from_preds_and_samples(cls, predictions, samples_plus_losses, padded_along_shortest=True, class_map=None, start_index=0):
+        """Returns the results dataframe for the predictions and samples, the record_index starts at start_index (for data that is added batch by batch)."""
         data = []
-        for index, (prediction, sample_plus_loss) in enumerate(zip(predictions, samples_plus_losses)):
+        for index, (prediction, sample_plus_loss) in enumerate(zip(predictions, samples_plus_losses), start_index):
             # TODO: At the moment only resize_and_pad or resize are handeled. Check if there are other edge cases that need to be included
             # The correction requires that the sample_plus_loss has the scaled image sizes (not the padded ones or the original ones)
             # correct the width and height to the values of the original image
@@ -609,10 +955,11 @@ class InstanceSegmentationResultsDataset(ResultsDataset):
             if len(prediction["labels"]) > 0:
                 masks_to_iterate_over = cls.get_masks_to_iterate_over(prediction)
 
-                for label, bbox, score, mask in zip(prediction["labels"], prediction["bboxes"], prediction["scores"], masks_to_iterate_over):
+                mask_areas, mask_image_sizes = erles_to_areas(masks_to_iterate_over)
+                for label, bbox, score, mask, mask_area, mask_image_size in zip(prediction["labels"], prediction["bboxes"], prediction["scores"], masks_to_iterate_over, mask_areas, mask_image_sizes):
+                    # the decoded mask is only needed to correct the mask
                     mask_array = mask_utils.decode([mask])
                     xmin, xmax, ymin, ymax = correct_x(bbox.xmin), correct_x(bbox.xmax), correct_y(bbox.ymin), correct_y(bbox.ymax)
-                    file_stats = sample_plus_loss.common.filepath.stat()
                     bbox_width = xmax - xmin
                     bbox_height = ymax - ymin
                     area = bbox_width * bbox_height
@@ -628,9 +975,9 @@ class InstanceSegmentationResultsDataset(ResultsDataset):
                         "bbox_xmin_normalized": xmin/width, "bbox_xmax_normalized": xmax/width, "bbox_ymin_normalized": ymin/height, "bbox_ymax_normalized": ymax/height,
                         "bbox_area_normalized": area_normalized, "bbox_ratio": bbox_ratio, "bbox_ratio_normalized": bbox_ratio*(height/width), "record_index": index,
                         "bbox_width": bbox_width, "bbox_height": bbox_height, "bbox_width_normalized": bbox_width/width, "bbox_height_normalized": bbox_height/height,
-                        "erles_corrected": erles_to_string(corrected_mask), "erles": erles_to_string(mask), "mask_area": mask_array.sum(), "mask_area_normalized": mask_array.sum()/mask_array.size, "mask_area_normalized_by_bbox_area": mask_array.sum()/area,
-                        "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": datetime.datetime.fromtimestamp(file_stats.st_ctime),
-                        "modification_date": datetime.datetime.fromtimestamp(file_stats.st_mtime), "num_annotations": len(prediction["bboxes"]), "is_prediction": True,
+                        "erles_corrected": erles_to_string(corrected_mask), "erles": erles_to_string(mask), "mask_area": mask_area, "mask_area_normalized": mask_area/mask_image_size, "mask_area_normalized_by_bbox_area": mask_area/area,
+                        "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": None,
+                        "modification_date": None, "num_annotations": len(prediction["bboxes"]), "is_prediction": True,
                     }
                     for key, value in losses.items():
                         image_data[key] = value
@@ -638,10 +985,11 @@ class InstanceSegmentationResultsDataset(ResultsDataset):
 
             if len(sample_plus_loss_dict["detection"]["labels"]) > 0:
                 masks_to_iterate_over = cls.get_masks_to_iterate_over(sample_plus_loss_dict["detection"])
-                for label, bbox, mask in zip(sample_plus_loss_dict["detection"]["labels"], sample_plus_loss_dict["detection"]["bboxes"], masks_to_iterate_over):
+                mask_areas, mask_image_sizes = erles_to_areas(masks_to_iterate_over)
+                for label, bbox, mask, mask_area, mask_image_size in zip(sample_plus_loss_dict["detection"]["labels"], sample_plus_loss_dict["detection"]["bboxes"], masks_to_iterate_over, mask_areas, mask_image_sizes):
+                    # the decoded mask is only needed to correct the mask
                     mask_array = mask_utils.decode([mask])
                     xmin, xmax, ymin, ymax = correct_x(bbox.xmin), correct_x(bbox.xmax), correct_y(bbox.ymin), correct_y(bbox.ymax)
-                    file_stats = sample_plus_loss.common.filepath.stat()
                     bbox_width = xmax - xmin
                     bbox_height = ymax - ymin
                     area = bbox_width * bbox_height
@@ -658,20 +1006,72 @@ class InstanceSegmentationResultsDataset(ResultsDataset):
                         "bbox_area_normalized": area_normalized, "bbox_ratio": bbox_ratio, "record_index": index,
                         "bbox_xmin_normalized": xmin/width, "bbox_xmax_normalized": xmax/width, "bbox_ymin_normalized": ymin/height, "bbox_ymax_normalized": ymax/height,
                         "bbox_width": bbox_width, "bbox_height": bbox_height,  "bbox_width_normalized": bbox_width/width, "bbox_height_normalized": bbox_height/height,
-                        "erles_corrected": erles_to_string(mask), "erles": erles_to_string(decorrected_mask), "mask_area": mask_array.sum(), "mask_area_normalized": mask_array.sum()/mask_array.size, "mask_area_normalized_by_bbox_area": mask_array.sum()/area,
-                        "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": datetime.datetime.fromtimestamp(file_stats.st_ctime),
-                        "modification_date": datetime.datetime.fromtimestamp(file_stats.st_mtime), "num_annotations": len(prediction["bboxes"]), "is_prediction": False,
+                        "erles_corrected": erles_to_string(mask), "erles": erles_to_string(decorrected_mask), "mask_area": mask_area, "mask_area_normalized": mask_area/mask_image_size, "mask_area_normalized_by_bbox_area": mask_area/area,
+                        "filepath": str(sample_plus_loss.common.filepath), "filename": str(sample_plus_loss.common.filepath).split("/")[-1], "creation_date": None,
+                        "modification_date": None, "num_annotations": len(prediction["bboxes"]), "is_prediction": False,
                     }
                     for key, value in losses.items():
                         image_data[key] = value
                     data.append(image_data)
 
         data = pd.DataFrame(data)
+        # every image file is read once
+        data["creation_date"], data["modification_date"] = cls.file_metadata_scanner.get_dates(data["filepath"])
         data["label_num"] = data["label"]
         if class_map is not None:
             data["label_num"] = data["label"].apply(class_map.get_by_name)
 
+        return data
+
+# Cell
+class ResultsAccumulator:
+    """Collects the results of a validation run batch by batch for a results dataset class (e.g. ObjectDetectionResultsDataset) and keeps its AP metrics up to date.
+    The AP can be checked at any time with get_ap, finalize returns the results dataset. The accumulated metrics are evaluated like the evaluation_mode "cumulative",
+    so the dataset only uses them if its metric descriptor has the same settings (see uses_accumulated_metrics), else the descriptor evaluates the data again
+    (e.g. for the default evaluation_mode "per_score"). With keep_data=False only the metrics are kept."""
+    def __init__(self, results_dataset_class, ious=None, area_range_mode="filter", padded_along_shortest=True, class_map=None, keep_data=True, max_dets=None):
+        self.results_dataset_class = results_dataset_class
+        self.padded_along_shortest = padded_along_shortest
+        self.class_map = class_map
+        self.keep_data = keep_data
+        self.metric_accumulator = results_dataset_class.ap_accumulator(ious, area_range_mode, max_dets=max_dets)
+        self.data = []
+        self.num_records = 0
+
+    def add_batch(self, predictions, samples_plus_losses):
+        """Adds the predictions and samples of a batch, every image needs to be in a single batch."""
+        data = self.results_dataset_class.get_dataframe_from_preds_and_samples(predictions, samples_plus_losses, self.padded_along_shortest, self.class_map, self.num_records)
+        self.num_records += len(predictions)
+        self.metric_accumulator.update(data)
+        if self.keep_data:
+            self.data.append(data)
+
+    def get_ap(self):
+        """Returns the current AP for every area range and class and the mAP."""
+        return self.metric_accumulator.get_ap()
+
+    @property
+    def metric_data(self):
+        return self.metric_accumulator.metric_data
+
+    def uses_accumulated_metrics(self):
+        """Returns True if the metric descriptor (metric_data_ap) of the results dataset class calculates the same metric data as the accumulator."""
+        descriptor, accumulator = self.results_dataset_class._descriptors["metric_data_ap"], self.metric_accumulator
+        return (
+            descriptor.evaluation_mode == accumulator.evaluation_mode and descriptor.area_range_mode == accumulator.area_range_mode
+            and descriptor.max_dets == accumulator.max_dets and descriptor.additional_stats == accumulator.additional_stats
+            and np.array_equal(np.asarray(descriptor.ious, dtype=float), np.asarray(accumulator.ious, dtype=float))
+        )
+
+    def finalize(self, name=None, description=None):
+        """Returns the results dataset with the data of all batches, its metric_data_ap is the accumulated metric data if the settings match (see uses_accumulated_metrics)."""
+        if not self.keep_data:
+            raise ValueError("The data of the batches was not kept (keep_data=False), only the metric data is available.")
+        data = pd.concat(self.data, ignore_index=True)
         if not any(data["is_prediction"] == True):
             raise ValueError("No predictions found.")
-
-        return cls(data, name, description)
\ No newline at end of file
+        dataset = self.results_dataset_class(data, name, description)
+        # the metrics are already computed, so the descriptor doesn't need to evaluate the data again
+        if self.uses_accumulated_metrics():
+            dataset._metric_data_ap = self.metric_accumulator.metric_data
+        return dataset
@@ -1,27 +1,101 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/metrics.ipynb (unless otherwise specified).
 
-__all__ = ['APObjectDetection', 'APInstanceSegmentation']
+__all__ = ['ScoreStats', 'APObjectDetection', 'APInstanceSegmentation', 'APAccumulator', 'APObjectDetectionAccumulator',
+           'APInstanceSegmentationAccumulator', 'MetricDataCache', 'ClassConfusionMatrix',
+           'ClassConfusionMatrixInstanceSegmentation']
 
 # Cell
 
 from typing import Union, Optional, Any, Iterable, Callable
 import os
+import time
 import shutil
+import pickle
 from abc import ABC, abstractmethod
-from joblib import delayed, Parallel
+from copy import copy
+from joblib import delayed, Parallel, effective_n_jobs
 
 import numpy as np
+import pandas as pd
 
 from pycocotools import mask as mask_utils
 
 from .utils import string_to_erles
 
+# Cell
+class ScoreStats:
+    """Stores a list of values for every score threshold as one flat array with start and end indices (CSR-style), the values of the score threshold i are values[starts[i]:ends[i]].
+    The values of a score threshold can overlap with the ones of another (e.g. prefixes of the same array), so they are stored only once.
+    Indexing returns the values of a score threshold as array, like the list of lists it replaces."""
+    def __init__(self, values, starts, ends):
+        self.values = np.asarray(values)
+        self.starts = np.asarray(starts, dtype=int)
+        self.ends = np.asarray(ends, dtype=int)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Creates the ScoreStats from a list with an array of values for every score threshold."""
+        ends = np.cumsum([len(array) for array in arrays], dtype=int)
+        values = np.concatenate(arrays) if len(arrays) > 0 else np.zeros(0)
+        return cls(values, ends - np.array([len(array) for array in arrays], dtype=int), ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        return self.values[self.starts[index]:self.ends[index]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def tolist(self):
+        return [self[index].tolist() for index in range(len(self))]
+
 # Cell
 class APObjectDetection:
-    """A faster implementaiton for the (m)AP scores."""
-    def __init__(self, data, ious=None):
+    """A faster implementaiton for the (m)AP scores. Every (area range, class) pair is evaluated as independent work unit, the results are stored in metric_data."""
+    EVALUATION_MODES = ["per_score", "cumulative"]
+    ADDITIONAL_STATS_KEYS = [
+        "x_center_offsets", "y_center_offsets", "center_distances", "unused_gt_box_areas_normalized", "unused_pred_box_areas_normalized",
+        "used_gt_box_areas_normalized", "used_pred_box_areas_normalized"
+    ]
+    OBJECT_KEYS = ["bboxes"]
+    AREA_COLUMN = "area"
+    AREA_RANGES = {"AP": (0, np.inf), "AP_small": (0, 32**2), "AP_medium": (32**2, 96**2), "AP_large": (96**2, np.inf)}
+    AREA_RANGE_MODES = ["filter", "ignore"]
+    # needs to be increased with every change of the results, invalidates the cached metric data
+    METRIC_VERSION = 4
+    SPATIAL_INDEX_MIN_BOXES = 200
+
+    def __init__(
+        self, data, ious=None, evaluation_mode="per_score", n_jobs=1, backend="loky", area_range_mode="filter", additional_stats=True, max_dets=None,
+        spatial_index_min_boxes=None
+    ):
+        """evaluation_mode: "per_score" re-evaluates the matching for every score threshold, "cumulative" sorts the predictions by score once,
+        matches them in that order (COCO-style) and derives the stats for all score thresholds from cumulative sums.
+        n_jobs: with n_jobs != 1 the work units are distributed over a joblib pool with the backend (n_jobs=-1 uses all cores), loky limits the numpy threads of the workers.
+        area_range_mode: "filter" evaluates every area range on the objects inside of it, "ignore" (requires the evaluation_mode "cumulative") matches all objects of an image once
+        like COCO and ignores the gts and unmatched predictions outside of the area range.
+        additional_stats: with False the additional stats (ADDITIONAL_STATS_KEYS, stored as ScoreStats) are skipped if only the AP is needed.
+        max_dets: only the max_dets predictions with the highest scores per image and class are evaluated (like the maxDets of COCO), the AR is the recall with all of them.
+        spatial_index_min_boxes: images with more objects (predictions and gts of a class) are matched on the pairs with overlapping bounding boxes (see sweep_candidate_pairs)
+        instead of the full iou matrix, the results are the same. The default is SPATIAL_INDEX_MIN_BOXES."""
+        if evaluation_mode not in self.EVALUATION_MODES:
+            raise ValueError("evaluation_mode has to be one of " + str(self.EVALUATION_MODES) + ".")
+        if area_range_mode not in self.AREA_RANGE_MODES:
+            raise ValueError("area_range_mode has to be one of " + str(self.AREA_RANGE_MODES) + ".")
+        if area_range_mode == "ignore" and evaluation_mode != "cumulative":
+            raise ValueError("The area_range_mode \"ignore\" requires the evaluation_mode \"cumulative\".")
         self.data = data
         self.ious = ious if ious is not None else np.arange(0.5, 1, 0.05).round(2)
+        self.evaluation_mode = evaluation_mode
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.area_range_mode = area_range_mode
+        self.additional_stats = additional_stats
+        self.max_dets = max_dets
+        self.spatial_index_min_boxes = spatial_index_min_boxes if spatial_index_min_boxes is not None else self.SPATIAL_INDEX_MIN_BOXES
         self.metric_data = self.get_metric_data()
 
     @staticmethod
@@ -43,241 +117,563 @@ class APObjectDetection:
             iou = intersection_area / (gt_box_area + pred_box_area - intersection_area)
             return iou, pred_box_area, gt_box_area, intersection_area
 
-    def get_image_stats(self, gt_boxes, pred_boxes, iou_threshold):
-        """
-        Returns: tp, fp, fn, :if additional_stats: x_center_offsets, y_center_offsets, center_distances, used_gt_box_areas_normalized, used_pred_box_areas_normalized, used_gt_box_areas_normalized, used_pred_box_areas_normalized
-        """
-        if pred_boxes is None:
-            return 0,  0, len(gt_boxes), [], [], [], [], [], [], []
-        if len(gt_boxes) == 0:
-            return 0, len(pred_boxes), 0, [], [], [], [], [], [], []
+    @staticmethod
+    def calculate_iou_matrix(pred_boxes, gt_boxes):
+        """Vectorized version of `calculate_iou` for all combinations of pred_boxes (N, 4) and gt_boxes (M, 4).
+        Returns the ious (N, M), pred box areas (N,), gt box areas (M,) and intersection areas (N, M)."""
+        pred_boxes = np.asarray(pred_boxes, dtype=float).reshape(-1, 4)
+        gt_boxes = np.asarray(gt_boxes, dtype=float).reshape(-1, 4)
+        # boxes that don't intersect get an intersection width or height of 0
+        lower_corners = np.maximum(pred_boxes[:, None, :2], gt_boxes[None, :, :2])
+        upper_corners = np.minimum(pred_boxes[:, None, 2:], gt_boxes[None, :, 2:])
+        intersection_sizes = np.maximum(upper_corners - lower_corners, 0)
+        intersection_areas = intersection_sizes[:, :, 0] * intersection_sizes[:, :, 1]
+        pred_box_areas = (pred_boxes[:, 2]-pred_boxes[:, 0]) * (pred_boxes[:, 3]-pred_boxes[:, 1])
+        gt_box_areas = (gt_boxes[:, 2]-gt_boxes[:, 0]) * (gt_boxes[:, 3]-gt_boxes[:, 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ious = intersection_areas / (pred_box_areas[:, None] + gt_box_areas[None, :] - intersection_areas)
+        return ious, pred_box_areas, gt_box_areas, intersection_areas
+
+    def calculate_object_ious(self, pred_objects, gt_objects):
+        """Returns the ious, pred areas, gt areas and intersection areas for all combinations of the objects of an image."""
+        return self.calculate_iou_matrix(pred_objects["bboxes"], gt_objects["bboxes"])
+
+    def get_object_boxes(self, objects):
+        """Returns the bounding boxes (N, 4) of the objects, used to find the candidate pairs of large images."""
+        return np.asarray(objects["bboxes"], dtype=float).reshape(-1, 4)
+
+    @staticmethod
+    def sweep_candidate_pairs(pred_boxes, gt_boxes):
+        """Finds all pairs of overlapping boxes with a sorted sweep over x instead of comparing all combinations.
+        With the gt boxes sorted by xmin, the gts that can overlap with a prediction are a contiguous window (xmin between the xmin of the prediction minus
+        the largest gt width and the xmax of the prediction), only the pairs inside of these windows are checked.
+        Returns the pred_indices and gt_indices of the overlapping pairs."""
+        order = np.argsort(gt_boxes[:, 0], kind="stable")
+        gt_xmins = gt_boxes[order, 0]
+        max_gt_width = (gt_boxes[:, 2]-gt_boxes[:, 0]).max()
+        window_starts = np.searchsorted(gt_xmins, pred_boxes[:, 0]-max_gt_width, side="right")
+        window_ends = np.searchsorted(gt_xmins, pred_boxes[:, 2], side="left")
+        window_sizes = np.maximum(window_ends-window_starts, 0)
+        pred_indices = np.repeat(np.arange(len(pred_boxes)), window_sizes)
+        window_offsets = np.arange(window_sizes.sum()) - np.repeat(np.cumsum(window_sizes)-window_sizes, window_sizes)
+        gt_indices = order[np.repeat(window_starts, window_sizes)+window_offsets]
+        lower_corners = np.maximum(pred_boxes[pred_indices, :2], gt_boxes[gt_indices, :2])
+        upper_corners = np.minimum(pred_boxes[pred_indices, 2:], gt_boxes[gt_indices, 2:])
+        overlapping = (upper_corners > lower_corners).all(axis=1)
+        return pred_indices[overlapping], gt_indices[overlapping]
+
+    def calculate_pair_ious(self, pred_objects, gt_objects, pred_indices, gt_indices):
+        """Returns the ious (P,), pred areas (N,), gt areas (M,) and intersection areas (P,) for the pairs (pred_indices[i], gt_indices[i])."""
+        pred_boxes, gt_boxes = self.get_object_boxes(pred_objects), self.get_object_boxes(gt_objects)
+        lower_corners = np.maximum(pred_boxes[pred_indices, :2], gt_boxes[gt_indices, :2])
+        upper_corners = np.minimum(pred_boxes[pred_indices, 2:], gt_boxes[gt_indices, 2:])
+        intersection_sizes = np.maximum(upper_corners - lower_corners, 0)
+        intersection_areas = intersection_sizes[:, 0] * intersection_sizes[:, 1]
+        pred_box_areas = (pred_boxes[:, 2]-pred_boxes[:, 0]) * (pred_boxes[:, 3]-pred_boxes[:, 1])
+        gt_box_areas = (gt_boxes[:, 2]-gt_boxes[:, 0]) * (gt_boxes[:, 3]-gt_boxes[:, 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ious = intersection_areas / (pred_box_areas[pred_indices] + gt_box_areas[gt_indices] - intersection_areas)
+        return ious, pred_box_areas, gt_box_areas, intersection_areas
+
+    def use_spatial_index(self, num_preds, num_gts):
+        """Returns True if the candidate pairs of an image with num_preds predictions and num_gts gts should be found with sweep_candidate_pairs."""
+        return num_preds + num_gts > self.spatial_index_min_boxes
+
+    def calculate_candidate_ious(self, pred_objects, gt_objects, min_iou):
+        """Returns the pairs of objects of an image with an iou of at least min_iou (in the order pred, gt): pred_indices, gt_indices, ious and intersection areas
+        (one value per pair) and the pred areas (N,) and gt areas (M,). For images with more than spatial_index_min_boxes objects only the pairs with overlapping
+        bounding boxes are evaluated, otherwise the ious of all combinations are calculated."""
+        num_preds, num_gts = len(pred_objects[self.OBJECT_KEYS[0]]), len(gt_objects[self.OBJECT_KEYS[0]])
+        if self.use_spatial_index(num_preds, num_gts):
+            pred_indices, gt_indices = self.sweep_candidate_pairs(self.get_object_boxes(pred_objects), self.get_object_boxes(gt_objects))
+            order = np.lexsort((gt_indices, pred_indices))
+            pred_indices, gt_indices = pred_indices[order], gt_indices[order]
+            ious, pred_areas, gt_areas, intersection_areas = self.calculate_pair_ious(pred_objects, gt_objects, pred_indices, gt_indices)
         else:
-            # calculate ious and log their mapping with box indices
-            gt_box_indices = []
-            pred_box_indices = []
-            ious = []
-            gt_box_areas = []
-            pred_box_areas = []
-            intersection_areas = []
-            for pred_box_index, pred_box in enumerate(pred_boxes):
-                for gt_box_index, gt_box in enumerate(gt_boxes):
-                    iou, pred_box_area, gt_box_area, intersection_area = self.calculate_iou(pred_box, gt_box)
-                    if iou >= iou_threshold:
-                        gt_box_indices.append(gt_box_index)
-                        pred_box_indices.append(pred_box_index)
-                        ious.append(iou)
-                        pred_box_areas.append(pred_box_area)
-                        gt_box_areas.append(gt_box_area)
-                        intersection_areas.append(intersection_area)
-
-            # check if any hits happend
-            if len(ious) == 0:
-                return 0, len(pred_boxes), len(gt_boxes), [], [], [], [], [], [], []
-            else:
-                # select matches based on iou
-                indices_descending = np.argsort(ious)[::-1]
-                gt_match_indices = []
-                pred_match_indices = []
-                x_center_offsets = []
-                y_center_offsets = []
-                center_distances = []
-                unused_gt_box_areas_normalized = []
-                unused_pred_box_areas_normalized = []
-                used_gt_box_areas_normalized = []
-                used_pred_box_areas_normalized = []
-                for index in indices_descending:
-                    gt_index = gt_box_indices[index]
-                    pred_index = pred_box_indices[index]
-                    if (gt_index not in gt_match_indices) and (pred_index not in pred_match_indices):
-                        gt_match_indices.append(gt_index)
-                        pred_match_indices.append(pred_index)
-                        # calculate additional stats
-                        pred_box_x1, pred_box_y1, pred_box_x2, pred_box_y2 = pred_boxes[pred_box_index]
-                        gt_box_x1, gt_box_y1, gt_box_x2, gt_box_y2 = gt_boxes[gt_box_index]
-
-                        x_center_offset = ((pred_box_x1+pred_box_x2)-(gt_box_x1+gt_box_x2))/2
-                        y_center_offset = ((pred_box_y1+pred_box_y2)-(gt_box_y1+gt_box_y2))/2
-                        x_center_offsets.append(x_center_offset)
-                        y_center_offsets.append(y_center_offset)
-                        center_distances.append((x_center_offset**2+y_center_offset**2)**0.5)
-                        unused_gt_box_areas_normalized.append((gt_box_areas[index]-intersection_areas[index])/gt_box_areas[index])
-                        unused_pred_box_areas_normalized.append((pred_box_areas[index]-intersection_areas[index])/pred_box_areas[index])
-                        used_gt_box_areas_normalized.append(intersection_areas[index]/gt_box_areas[index])
-                        used_pred_box_areas_normalized.append(intersection_areas[index]/pred_box_areas[index])
-
-                return len(gt_match_indices), len(pred_boxes) - len(pred_match_indices), len(gt_boxes) - len(gt_match_indices), x_center_offsets, y_center_offsets, center_distances, unused_gt_box_areas_normalized, unused_pred_box_areas_normalized, used_gt_box_areas_normalized, used_pred_box_areas_normalized
+            iou_matrix, pred_areas, gt_areas, intersection_matrix = self.calculate_object_ious(pred_objects, gt_objects)
+            pred_indices, gt_indices = np.nonzero(iou_matrix >= min_iou)
+            ious, intersection_areas = iou_matrix[pred_indices, gt_indices], intersection_matrix[pred_indices, gt_indices]
+        above_min_iou = ious >= min_iou
+        return pred_indices[above_min_iou], gt_indices[above_min_iou], ious[above_min_iou], intersection_areas[above_min_iou], pred_areas, gt_areas
 
-    def get_precision_and_recall(self, gt, pred, iou):
-        """gt and pred need to be sored dicts with the lowest score being the first entry"""
-        tps, fps, fns = [], [], []
-        precisions, recalls, score_thresholds = [], [], []
-        x_center_offsets, y_center_offsets, center_distances, unused_gt_box_areas_normalized, unused_pred_box_areas_normalized, used_gt_box_areas_normalized, used_pred_box_areas_normalized = [], [], [], [], [], [], []
+    @staticmethod
+    def greedy_matching(pred_indices, gt_indices, ious):
+        """Matches the candidate pairs (pred_indices[i], gt_indices[i]) greedily in the order of descending iou, every box can only be used once.
+        Returns the indices of the accepted pairs in the order they were accepted."""
+        used_preds, used_gts = set(), set()
+        accepted_pairs = []
+        for index in np.argsort(ious)[::-1]:
+            pred_index, gt_index = pred_indices[index], gt_indices[index]
+            if (gt_index not in used_gts) and (pred_index not in used_preds):
+                used_gts.add(gt_index)
+                used_preds.add(pred_index)
+                accepted_pairs.append(index)
+        return np.array(accepted_pairs, dtype=int)
 
-        if pred is None:
-            return {
-                "tp": np.array([0]), "fp": [sum(len(gt_boxes) for gt_boxes in gt.values())], "fn": np.array([0]),
-                "precision": np.array([0]), "recall": np.array([0]), "scores": np.array([0]),
-                "ap11": 0, "ap": 0, "monotonic_recalls": np.array([0]), "monotonic_precisions": np.array([0]),
-                "ap11_recalls": np.array([0]), "ap11_precisions": np.array([0]), "x_center_offsets": np.array([0]),
-                "y_center_offsets": np.array([0]), "center_distances": np.array([0]),
-                "unused_gt_box_areas_normalized": np.array([0]), "unused_pred_box_areas_normalized": np.array([0]),
-                "used_gt_box_areas_normalized": np.array([0]), "used_pred_box_areas_normalized": np.array([0])
-            }
-
-        scores = list(pred.keys())
-        pred_boxes = list(pred.values())
+    @staticmethod
+    def score_ordered_matching(ious, iou_threshold, gt_ignore=None):
+        """Matches the predictions (rows of ious, sorted by descending score) one after another to the unmatched gt with the highest iou above the threshold.
+        Like in COCO a prediction is only matched to an ignored gt (gt_ignore) if no unmatched gt that is not ignored is above the threshold.
+        Returns the index of the matched gt for every prediction (-1 if the prediction is a false positive)."""
+        gt_match_indices = np.full(ious.shape[0], -1)
+        available_ious = np.where(ious >= iou_threshold, ious, -1)
+        if gt_ignore is not None:
+            # ious are at most 1, the offset ranks every available gt that is not ignored above all ignored ones
+            available_ious = np.where(available_ious >= 0, available_ious + 2*(~gt_ignore), -1)
+        for pred_index in range(ious.shape[0]):
+            gt_index = available_ious[pred_index].argmax()
+            if available_ious[pred_index, gt_index] >= 0:
+                gt_match_indices[pred_index] = gt_index
+                available_ious[:, gt_index] = -1
+        return gt_match_indices
+
+    @staticmethod
+    def score_ordered_pair_matching(num_preds, pred_indices, gt_indices, ious, iou_threshold, gt_ignore=None):
+        """Same as score_ordered_matching for the candidate pairs (pred_indices[i], gt_indices[i]) with the iou ious[i] instead of the full iou matrix,
+        all other combinations have an iou of 0. Returns the index of the matched gt for every prediction (-1 if the prediction is a false positive)."""
+        gt_match_indices = np.full(num_preds, -1)
+        candidates = np.nonzero(ious >= iou_threshold)[0]
+        priorities = ious[candidates] if gt_ignore is None else ious[candidates] + 2*(~gt_ignore[gt_indices[candidates]])
+        # every prediction tries its pairs in the order of descending priority, equal priorities are decided by the gt index (like argmax)
+        candidates = candidates[np.lexsort((gt_indices[candidates], -priorities, pred_indices[candidates]))]
+        used_gts = set()
+        for pred_index, gt_index in zip(pred_indices[candidates].tolist(), gt_indices[candidates].tolist()):
+            if gt_match_indices[pred_index] < 0 and gt_index not in used_gts:
+                gt_match_indices[pred_index] = gt_index
+                used_gts.add(gt_index)
+        return gt_match_indices
+
+    @staticmethod
+    def calculate_additional_stats(pred_boxes, gt_boxes, pred_box_areas, gt_box_areas, intersection_areas):
+        """Calculates the additional stats for matched pairs of boxes. Returns: x_center_offsets, y_center_offsets, center_distances, unused_gt_box_areas_normalized, unused_pred_box_areas_normalized, used_gt_box_areas_normalized, used_pred_box_areas_normalized"""
+        x_center_offsets = ((pred_boxes[:, 0]+pred_boxes[:, 2])-(gt_boxes[:, 0]+gt_boxes[:, 2]))/2
+        y_center_offsets = ((pred_boxes[:, 1]+pred_boxes[:, 3])-(gt_boxes[:, 1]+gt_boxes[:, 3]))/2
+        center_distances = (x_center_offsets**2+y_center_offsets**2)**0.5
+        unused_gt_box_areas_normalized = (gt_box_areas-intersection_areas)/gt_box_areas
+        unused_pred_box_areas_normalized = (pred_box_areas-intersection_areas)/pred_box_areas
+        used_gt_box_areas_normalized = intersection_areas/gt_box_areas
+        used_pred_box_areas_normalized = intersection_areas/pred_box_areas
+        return x_center_offsets, y_center_offsets, center_distances, unused_gt_box_areas_normalized, unused_pred_box_areas_normalized, used_gt_box_areas_normalized, used_pred_box_areas_normalized
+
+    def get_matched_additional_stats(self, pred_objects, gt_objects, pred_match_indices, gt_match_indices, pred_areas, gt_areas, intersection_areas):
+        """Returns the additional stats of the matched objects as an array with the shape (num_matches, len(ADDITIONAL_STATS_KEYS))."""
+        pred_boxes = np.asarray(pred_objects["bboxes"], dtype=float).reshape(-1, 4)[pred_match_indices]
+        gt_boxes = np.asarray(gt_objects["bboxes"], dtype=float).reshape(-1, 4)[gt_match_indices]
+        return np.stack(self.calculate_additional_stats(pred_boxes, gt_boxes, pred_areas, gt_areas, intersection_areas), axis=1)
+
+    def get_image_stats_for_ious(self, gt_objects, pred_objects, ious):
+        """Matches the objects of an image for all iou thresholds with a single greedy pass (in the order of descending iou) over all pairs with an iou of at least min(ious).
+        The matching for a threshold is the part of this pass that was accepted with an iou above the threshold.
+        Returns for every iou threshold: tp, fp, fn, additional_stats (array with the shape (tp, len(ADDITIONAL_STATS_KEYS)))"""
+        num_gts = len(gt_objects[self.OBJECT_KEYS[0]])
+        num_preds = 0 if pred_objects is None else len(pred_objects[self.OBJECT_KEYS[0]])
+        no_additional_stats = np.zeros((0, len(self.ADDITIONAL_STATS_KEYS)))
+        if num_preds == 0 or num_gts == 0:
+            return [(0, num_preds, num_gts, no_additional_stats) for _ in ious]
+
+        # keep the object pairs with an iou above the lowest threshold (in the order pred, gt)
+        pred_indices, gt_indices, pair_ious, intersection_areas, pred_areas, gt_areas = self.calculate_candidate_ious(pred_objects, gt_objects, min(ious))
+        # check if any hits happend
+        if len(pred_indices) == 0:
+            return [(0, num_preds, num_gts, no_additional_stats) for _ in ious]
+
+        # select matches based on iou
+        accepted_pairs = self.greedy_matching(pred_indices, gt_indices, pair_ious)
+        pred_match_indices, gt_match_indices = pred_indices[accepted_pairs], gt_indices[accepted_pairs]
+        accepted_ious = pair_ious[accepted_pairs]
+        if self.additional_stats:
+            additional_stats = self.get_matched_additional_stats(
+                pred_objects, gt_objects, pred_match_indices, gt_match_indices, pred_areas[pred_match_indices],
+                gt_areas[gt_match_indices], intersection_areas[accepted_pairs]
+            )
+        else:
+            additional_stats = np.zeros((len(pred_match_indices), len(self.ADDITIONAL_STATS_KEYS)))
+        image_stats = []
+        for iou in ious:
+            is_match = accepted_ious >= iou
+            tp = int(is_match.sum())
+            image_stats.append((tp, num_preds - tp, num_gts - tp, additional_stats[is_match]))
+        return image_stats
+
+    def get_image_stats(self, gt_objects, pred_objects, iou_threshold):
+        """
+        Returns: tp, fp, fn, :if additional_stats: x_center_offsets, y_center_offsets, center_distances, unused_gt_areas_normalized, unused_pred_areas_normalized, used_gt_areas_normalized, used_pred_areas_normalized
+        """
+        tp, fp, fn, additional_stats = self.get_image_stats_for_ious(gt_objects, pred_objects, [iou_threshold])[0]
+        return (tp, fp, fn, *[stat.tolist() for stat in additional_stats.T])
+
+    @staticmethod
+    def group_by_filename(filenames):
+        """Returns a dict with the positions of every filename in filenames, the positions of a filename keep their order."""
+        unique_filenames, image_indices = np.unique(filenames, return_inverse=True)
+        image_order = np.argsort(image_indices, kind="stable")
+        image_starts = np.searchsorted(image_indices[image_order], np.arange(1, len(unique_filenames)))
+        return dict(zip(unique_filenames, np.split(image_order, image_starts)))
+
+    def sweep_score_thresholds(self, gt, pred, ious):
+        """Re-evaluates the matching for every score threshold with all predictions that have the same or a higher score.
+        Returns for every iou: tps, fps, fns, score_thresholds, additional_stats (each of them with one entry per score threshold)"""
+        sweeps = [([], [], [], [], []) for _ in ious]
+
+        # the predictions are sorted by ascending score, so the active predictions (same or higher score) of a score are the ones after its first occurence
+        unique_scores, score_starts = np.unique(pred["scores"], return_index=True)
+        image_positions = self.group_by_filename(pred["filename"])
         # loop over scores to calculate statistics for the score
-        for score_index, score in enumerate(scores):
-            score_tp, score_fp, score_fn = 0, 0, 0
-            score_x_center_offsets, score_y_center_offsets, score_center_distances, score_unused_gt_box_areas_normalized, score_unused_pred_box_areas_normalized = [], [], [], [], []
-            score_used_gt_box_areas_normalized, score_used_pred_box_areas_normalized = [], []
-            # create dict with active predicitons (prediction with the same or higher score)
-            active_preds = {}
-            for pred_entry in pred_boxes[score_index:]:
-                for filename, bbox in zip(pred_entry["filename"], pred_entry["bboxes"]):
-                    if filename not in active_preds.keys():
-                        active_preds[filename] = [bbox]
-                    else:
-                        active_preds[filename].append(bbox)
+        for score, score_start in zip(unique_scores, score_starts):
             # loop over gt images
-            for filename, image_gt_boxes in gt.items():
-                img_tp, img_fp, img_fn, img_x_center_offsets, img_y_center_offsets, img_center_distances, img_unused_gt_box_areas_normalized, img_unused_pred_box_areas_normalized, img_used_gt_box_areas_normalized, img_used_pred_box_areas_normalized = self.get_image_stats(image_gt_boxes, active_preds.get(filename, None), iou)
-                score_tp += img_tp
-                score_fp += img_fp
-                score_fn += img_fn
-                score_x_center_offsets += img_x_center_offsets
-                score_y_center_offsets += img_y_center_offsets
-                score_center_distances += img_center_distances
-                score_unused_gt_box_areas_normalized += img_unused_gt_box_areas_normalized
-                score_unused_pred_box_areas_normalized += img_unused_pred_box_areas_normalized
-                score_used_gt_box_areas_normalized += img_used_gt_box_areas_normalized
-                score_used_pred_box_areas_normalized += img_used_pred_box_areas_normalized
-            # calculate precision and recall for the threshold
-            score_precision = score_tp/(score_tp + score_fp) if score_tp + score_fp > 0 else 0
-            score_recall = score_tp/(score_tp + score_fn) if score_tp + score_fn > 0 else 0
-
-            tps.append(score_tp)
-            fps.append(score_fp)
-            fns.append(score_fn)
-            precisions.append(score_precision)
-            recalls.append(score_recall)
-            score_thresholds.append(score)
-
-            x_center_offsets.append(score_x_center_offsets)
-            y_center_offsets.append(score_y_center_offsets)
-            center_distances.append(score_center_distances)
-            unused_gt_box_areas_normalized.append(score_unused_gt_box_areas_normalized)
-            unused_pred_box_areas_normalized.append(score_unused_pred_box_areas_normalized)
-            used_gt_box_areas_normalized.append(score_used_gt_box_areas_normalized)
-            used_pred_box_areas_normalized.append(score_used_pred_box_areas_normalized)
+            score_stats = [[0, 0, 0, []] for _ in ious]
+            for filename, image_gt_objects in gt.items():
+                positions = image_positions.get(filename, None)
+                active_preds = None if positions is None else {key: pred[key][positions[np.searchsorted(positions, score_start):]] for key in self.OBJECT_KEYS}
+                for iou_score_stats, (img_tp, img_fp, img_fn, img_additional_stats) in zip(score_stats, self.get_image_stats_for_ious(image_gt_objects, active_preds, ious)):
+                    iou_score_stats[0] += img_tp
+                    iou_score_stats[1] += img_fp
+                    iou_score_stats[2] += img_fn
+                    iou_score_stats[3].append(img_additional_stats)
+
+            for (tps, fps, fns, score_thresholds, additional_stats), (score_tp, score_fp, score_fn, score_additional_stats) in zip(sweeps, score_stats):
+                tps.append(score_tp)
+                fps.append(score_fp)
+                fns.append(score_fn)
+                score_thresholds.append(score)
+                additional_stats.append(np.concatenate(score_additional_stats))
+
+        return [
+            (tps, fps, fns, score_thresholds, self.get_score_stats(additional_stats)) for tps, fps, fns, score_thresholds, additional_stats in sweeps
+        ]
+
+    def get_score_stats(self, additional_stats):
+        """Converts the additional stats (an array with the shape (num_matches, len(ADDITIONAL_STATS_KEYS)) for every score threshold) to a ScoreStats for every key,
+        returns an empty list if the additional stats are skipped."""
+        if not self.additional_stats:
+            return []
+        score_stats = ScoreStats.from_arrays(additional_stats)
+        # one contiguous array per key
+        values = np.ascontiguousarray(score_stats.values.reshape(-1, len(self.ADDITIONAL_STATS_KEYS)).T)
+        return [ScoreStats(key_values, score_stats.starts, score_stats.ends) for key_values in values]
+
+    def sweep_cumulative(self, gt, pred, ious):
+        """Sorts all predictions by score once, matches them in that order and derives the stats for every score threshold from cumulative sums.
+        The ious of an image are calculated once and reused for all iou thresholds. Predictions on images without gt objects count as false positives.
+        Returns for every iou: tps, fps, fns, score_thresholds, additional_stats (each of them with one entry per score threshold)"""
+        return self.sweep_cumulative_area_ranges(gt, pred, ious, {"AP": (0, np.inf)})["AP"]
+
+    def sweep_cumulative_area_ranges(self, gt, pred, ious, area_ranges):
+        """Like sweep_cumulative but for every area range in area_ranges ({name: (min_area, max_area)}), the ious of an image are calculated once for all of them.
+        The gts outside of an area range are ignored (COCO-style), predictions matched to an ignored gt and unmatched predictions outside of the area range are ignored as well.
+        Returns {name: sweeps} for all area ranges with at least one gt that is not ignored."""
+        area_range_matches = self.match_cumulative_area_ranges(gt, pred, ious, area_ranges)
+        return {name: self.summarize_cumulative_matches(*matches) for name, matches in area_range_matches.items() if matches[-1] > 0}
+
+    def match_cumulative_area_ranges(self, gt, pred, ious, area_ranges):
+        """Matches the predictions of every image in the order of descending score for every area range and iou (see sweep_cumulative_area_ranges).
+        Returns {name: (scores, is_tp, is_ignored, matched_stats, num_gt_objects)} with the predictions sorted by descending score,
+        is_tp and is_ignored have the shape (len(ious), num_preds) and matched_stats (len(ious), num_preds, len(ADDITIONAL_STATS_KEYS))."""
+        if pred is None:
+            pred = {"scores": np.zeros(0), "filename": np.zeros(0, dtype=object), "areas": np.zeros(0), **{key: np.zeros(0, dtype=object) for key in self.OBJECT_KEYS}}
+        # sort once by descending score (stable so that the input order decides between equal scores)
+        order = np.argsort(-pred["scores"], kind="stable")
+        pred_scores, pred_filenames = pred["scores"][order], pred["filename"][order]
+        pred_objects = {key: pred[key][order] for key in self.OBJECT_KEYS}
+        pred_outside = {name: self.is_outside_area_range(pred, area_range)[order] for name, area_range in area_ranges.items()}
+        gt_outside = {filename: {name: self.is_outside_area_range(gt_objects, area_range) for name, area_range in area_ranges.items()} for filename, gt_objects in gt.items()}
+
+        is_tp = {name: np.zeros((len(ious), len(pred_scores)), dtype=bool) for name in area_ranges.keys()}
+        is_ignored = {name: np.repeat(pred_outside[name][None], len(ious), axis=0) for name in area_ranges.keys()}
+        # without additional stats no values are stored
+        num_stats = len(self.ADDITIONAL_STATS_KEYS) if self.additional_stats else 0
+        matched_stats = {name: np.zeros((len(ious), len(pred_scores), num_stats)) for name in area_ranges.keys()}
+        # the positions of every image keep the descending score order
+        for filename, image_pred_indices in self.group_by_filename(pred_filenames).items():
+            image_gt_objects = gt.get(filename, None)
+            if image_gt_objects is None or len(image_gt_objects[self.OBJECT_KEYS[0]]) == 0:
+                continue
+            image_pred_objects = {key: objects[image_pred_indices] for key, objects in pred_objects.items()}
+            num_gts = len(image_gt_objects[self.OBJECT_KEYS[0]])
+            if self.use_spatial_index(len(image_pred_indices), num_gts):
+                # large images are matched on the candidate pairs, the intersection areas are looked up by the sorted pair keys
+                pair_pred_indices, pair_gt_indices, pair_ious, pair_intersection_areas, pred_areas, gt_areas = self.calculate_candidate_ious(
+                    image_pred_objects, image_gt_objects, min(ious)
+                )
+                pair_keys = pair_pred_indices*num_gts + pair_gt_indices
+                match_objects = lambda iou, gt_ignore: self.score_ordered_pair_matching(len(image_pred_indices), pair_pred_indices, pair_gt_indices, pair_ious, iou, gt_ignore)
+                get_intersection_areas = lambda pred_match_indices, gt_match_indices: pair_intersection_areas[np.searchsorted(pair_keys, pred_match_indices*num_gts + gt_match_indices)]
+            else:
+                iou_matrix, pred_areas, gt_areas, intersection_areas = self.calculate_object_ious(image_pred_objects, image_gt_objects)
+                match_objects = lambda iou, gt_ignore: self.score_ordered_matching(iou_matrix, iou, gt_ignore)
+                get_intersection_areas = lambda pred_match_indices, gt_match_indices: intersection_areas[pred_match_indices, gt_match_indices]
+            for name in area_ranges.keys():
+                gt_ignore = gt_outside[filename][name]
+                for iou_index, iou in enumerate(ious):
+                    gt_match_indices = match_objects(iou, gt_ignore if gt_ignore.any() else None)
+                    matched = gt_match_indices >= 0
+                    pred_match_indices, gt_match_indices = np.nonzero(matched)[0], gt_match_indices[matched]
+                    # a match decides if the prediction is ignored, the area of the prediction only matters for false positives
+                    is_ignored[name][iou_index, image_pred_indices[pred_match_indices]] = gt_ignore[gt_match_indices]
+                    pred_match_indices, gt_match_indices = pred_match_indices[~gt_ignore[gt_match_indices]], gt_match_indices[~gt_ignore[gt_match_indices]]
+                    is_tp[name][iou_index, image_pred_indices[pred_match_indices]] = True
+                    if self.additional_stats:
+                        matched_stats[name][iou_index, image_pred_indices[pred_match_indices]] = self.get_matched_additional_stats(
+                            image_pred_objects, image_gt_objects, pred_match_indices, gt_match_indices, pred_areas[pred_match_indices],
+                            gt_areas[gt_match_indices], get_intersection_areas(pred_match_indices, gt_match_indices)
+                        )
 
-        # convert data to np.arrays for further processing
-        tps = np.array(tps)
-        fps = np.array(fps)
-        fns = np.array(fns)
-        precisions = np.array(precisions)
-        recalls = np.array(recalls)
-        score_thresholds = np.array(score_thresholds)
+        return {
+            name: (pred_scores, is_tp[name], is_ignored[name], matched_stats[name], sum(int((~image_gt_outside[name]).sum()) for image_gt_outside in gt_outside.values()))
+            for name in area_ranges.keys()
+        }
 
-        # calculate additional stats
+    def summarize_cumulative_matches(self, scores, is_tp, is_ignored, matched_stats, num_gt_objects):
+        """Derives the stats for every score threshold from the cumulative sums of the matches (predictions sorted by descending score, see match_cumulative_area_ranges).
+        Returns for every iou: tps, fps, fns, score_thresholds, additional_stats (a ScoreStats for every key, empty if the additional stats are skipped)"""
+        sweeps = []
+        for iou_is_tp, iou_is_ignored, iou_matched_stats in zip(is_tp, is_ignored, matched_stats):
+            # ignored predictions don't change the stats, only the scores of the other predictions are score thresholds
+            counted_positions = np.nonzero(~iou_is_ignored)[0] if not iou_is_ignored.all() else np.arange(len(scores))
+            # the last prediction of every score is the point where all predictions with this score are active, the output is sorted by ascending score
+            counted_scores = scores[counted_positions]
+            score_ends = counted_positions[np.append(np.nonzero(np.diff(counted_scores))[0], len(counted_scores)-1)[::-1]]
+            score_thresholds = scores[score_ends]
+            tps = np.cumsum(iou_is_tp)[score_ends]
+            fps = np.cumsum(~iou_is_tp & ~iou_is_ignored)[score_ends]
+            fns = num_gt_objects - tps
+            # the matches of a score threshold are the first tps matches, so all score thresholds share one array
+            tp_stats = np.ascontiguousarray(iou_matched_stats[iou_is_tp].T)
+            iou_additional_stats = [ScoreStats(key_values, np.zeros(len(tps), dtype=int), tps) for key_values in tp_stats] if self.additional_stats else []
+            sweeps.append((tps, fps, fns, score_thresholds, iou_additional_stats))
+        return sweeps
 
+    @staticmethod
+    def calculate_ap(precisions, recalls):
+        """Calculates the AP11 and the AP (area under the monotonic precision-recall curve).
+        Returns: ap11, ap11_precisions, ap, monotonic_recalls, monotonic_precisions"""
         # AP11
         precisions_at_recall_value = []
         for recall_value in np.linspace(0.0, 1.0, 11):
-            indices = np.argwhere(np.array(recalls) >= recall_value).flatten()
+            indices = np.argwhere(recalls >= recall_value).flatten()
             precision_max = max(precisions[indices]) if indices.size > 0 else 0
             precisions_at_recall_value.append(precision_max)
         ap11 = np.mean(precisions_at_recall_value)
 
         #AP
         sorted_indices = np.argsort(recalls)
-        sorted_recalls = recalls[sorted_indices]
-        sorted_precision = precisions[sorted_indices]
         # make the precision values monotonically
-        calc_recalls = [0] + sorted_recalls.tolist() + [1]
-        calc_precisions = [0] + sorted_precision.tolist() + [0]
-        for i in range(len(calc_recalls)-2, -1, -1):
-            calc_precisions[i] = max(calc_precisions[i], calc_precisions[i+1])
-        # get indices where the recall value changes
-        changing_index_list = []
-        for i in range(1, len(calc_recalls)):
-            if calc_recalls[i] != calc_recalls[i-1]:
-                changing_index_list.append(i)
-        ap = 0.0
-        for i in changing_index_list:
-            ap += ((calc_recalls[i]-calc_recalls[i-1])*calc_precisions[i])
+        calc_recalls = np.concatenate([[0], recalls[sorted_indices], [1]])
+        calc_precisions = np.maximum.accumulate(np.concatenate([[0], precisions[sorted_indices], [0]])[::-1])[::-1]
+        # only the indices where the recall value changes contribute
+        ap = float(np.sum(np.diff(calc_recalls) * calc_precisions[1:]))
+        return ap11, np.array(precisions_at_recall_value), ap, calc_recalls, calc_precisions
+
+    def summarize_sweep(self, tps, fps, fns, score_thresholds, additional_stats):
+        """Calculates precision, recall and the AP values from the result of a sweep over the score thresholds and returns them as dict."""
+        # convert data to np.arrays for further processing
+        tps = np.array(tps)
+        fps = np.array(fps)
+        fns = np.array(fns)
+        score_thresholds = np.array(score_thresholds)
+        # calculate precision and recall for the thresholds
+        precisions = np.divide(tps, tps + fps, out=np.zeros(len(tps)), where=(tps + fps) > 0)
+        recalls = np.divide(tps, tps + fns, out=np.zeros(len(tps)), where=(tps + fns) > 0)
 
-        return {
+        # calculate additional stats
+        ap11, ap11_precisions, ap, monotonic_recalls, monotonic_precisions = self.calculate_ap(precisions, recalls)
+
+        metric_data = {
             "tp": tps, "fp": fps, "fn": fns, "precision": precisions, "recall": recalls, "scores": score_thresholds,
-            "ap11": ap11, "ap": ap, "monotonic_recalls": np.array(calc_recalls), "monotonic_precisions": np.array(calc_precisions),
-            "ap11_recalls": np.linspace(0.0, 1.0, 11), "ap11_precisions": np.array(precisions_at_recall_value), "x_center_offsets": x_center_offsets,
-            "y_center_offsets": y_center_offsets, "center_distances": center_distances,
-            "unused_gt_box_areas_normalized": unused_gt_box_areas_normalized, "unused_pred_box_areas_normalized": unused_pred_box_areas_normalized,
-            "used_gt_box_areas_normalized": used_gt_box_areas_normalized, "used_pred_box_areas_normalized": used_pred_box_areas_normalized
+            "ap11": ap11, "ap": ap, "monotonic_recalls": monotonic_recalls, "monotonic_precisions": monotonic_precisions,
+            "ap11_recalls": np.linspace(0.0, 1.0, 11), "ap11_precisions": ap11_precisions, "ar": recalls.max() if len(recalls) > 0 else 0,
+        }
+        for key, stat in zip(self.ADDITIONAL_STATS_KEYS, additional_stats):
+            metric_data[key] = stat
+        return metric_data
+
+    def get_no_pred_data(self, num_gt_objects):
+        """Returns the precision and recall data of a class without predictions."""
+        no_pred_data = {
+            "tp": np.array([0]), "fp": [num_gt_objects], "fn": np.array([0]),
+            "precision": np.array([0]), "recall": np.array([0]), "scores": np.array([0]),
+            "ap11": 0, "ap": 0, "monotonic_recalls": np.array([0]), "monotonic_precisions": np.array([0]),
+            "ap11_recalls": np.array([0]), "ap11_precisions": np.array([0]), "ar": 0,
         }
+        if self.additional_stats:
+            for key in self.ADDITIONAL_STATS_KEYS:
+                no_pred_data[key] = np.array([0])
+        return no_pred_data
+
+    def get_precision_and_recall_for_ious(self, gt, pred, ious):
+        """Returns a dict with the precision and recall data for every iou in ious. gt and pred need to be sored dicts with the lowest score being the first entry"""
+        if pred is None:
+            no_pred_data = self.get_no_pred_data(sum(len(gt_objects[self.OBJECT_KEYS[0]]) for gt_objects in gt.values()))
+            return {iou: no_pred_data for iou in ious}
+
+        if self.evaluation_mode == "cumulative":
+            sweeps = self.sweep_cumulative(gt, pred, ious)
+        else:
+            sweeps = self.sweep_score_thresholds(gt, pred, ious)
+        return {iou: self.summarize_sweep(*sweep) for iou, sweep in zip(ious, sweeps)}
+
+    def get_precision_and_recall_for_area_ranges(self, gt, pred, ious):
+        """Returns {area range name: {iou: precision and recall data}} for every area range in AREA_RANGES with gts (COCO-style ignore semantics)."""
+        if pred is None:
+            area_range_data = {}
+            for name, area_range in self.AREA_RANGES.items():
+                num_gt_objects = sum(int((~self.is_outside_area_range(gt_objects, area_range)).sum()) for gt_objects in gt.values())
+                if num_gt_objects > 0:
+                    no_pred_data = self.get_no_pred_data(num_gt_objects)
+                    area_range_data[name] = {iou: no_pred_data for iou in ious}
+            return area_range_data
+
+        area_range_sweeps = self.sweep_cumulative_area_ranges(gt, pred, ious, self.AREA_RANGES)
+        return {name: {iou: self.summarize_sweep(*sweep) for iou, sweep in zip(ious, sweeps)} for name, sweeps in area_range_sweeps.items()}
+
+    def get_precision_and_recall(self, gt, pred, iou):
+        """gt and pred need to be sored dicts with the lowest score being the first entry"""
+        return self.get_precision_and_recall_for_ious(gt, pred, [iou])[iou]
 
     @staticmethod
-    def prepare_data(df):
-        ground_truth, preds = df[df["is_prediction"] == False].sort_values("score"), df[df["is_prediction"] == True].sort_values("score")
+    def summarize_ious(iou_data):
+        """Adds the AP and AR of a class (mean over the ious) to its data ({iou: data})."""
+        ap = np.array([iou["ap"] for iou in iou_data.values()]).mean()
+        ar = np.array([iou["ar"] for iou in iou_data.values()]).mean()
+        iou_data["ap"], iou_data["ar"] = ap, ar
+        return iou_data
+
+    @staticmethod
+    def summarize_classes(class_data):
+        """Adds the mAP and mAR (mean over the classes) to the data of an area range ({class name: data})."""
+        class_entries = list(class_data.values())
+        class_data["map"] = np.array([class_entry["ap"] for class_entry in class_entries]).mean() if len(class_entries) > 0 else 0
+        class_data["mar"] = np.array([class_entry["ar"] for class_entry in class_entries]).mean() if len(class_entries) > 0 else 0
+        return class_data
+
+    def select_top_detections(self, df):
+        """Keeps the max_dets predictions with the highest scores per image and class (all if max_dets is None), the top k are selected with argpartition."""
+        if self.max_dets is None:
+            return df
+        is_prediction = df["is_prediction"].to_numpy(dtype=bool)
+        pred_positions = np.nonzero(is_prediction)[0]
+        scores = df["score"].to_numpy(dtype=float)[pred_positions]
+        keep = np.ones(len(pred_positions), dtype=bool)
+        for indices in df.iloc[pred_positions].groupby(["filename", "label"], sort=False).indices.values():
+            if len(indices) > self.max_dets:
+                keep[indices] = False
+                keep[indices[np.argpartition(-scores[indices], self.max_dets-1)[:self.max_dets]]] = True
+        keep_rows = ~is_prediction
+        keep_rows[pred_positions[keep]] = True
+        return df[keep_rows]
+
+    def get_object_arrays(self, df):
+        """Returns the objects of the rows of df as arrays, one for every key in OBJECT_KEYS."""
+        return {"bboxes": df[["bbox_xmin", "bbox_ymin", "bbox_xmax", "bbox_ymax"]].to_numpy(dtype=float)}
+
+    def prepare_data(self, df):
+        """Groups the data by label (and filename for the ground truth) with index arrays and slices the objects as contiguous arrays.
+        Returns:
+            gt_dict: {label: {filename: {object_key: objects, "areas": areas}}}
+            pred_dict: {label: {"scores": scores, "filename": filenames, object_key: objects, "areas": areas}}, sorted by ascending score
+        """
+        ground_truth = df[df["is_prediction"] == False].sort_values(["label", "filename"], kind="stable")
+        preds = df[df["is_prediction"] == True].sort_values(["label", "score"], kind="stable")
 
         pred_dict = {}
-        for index, row in preds.iterrows():
-            if row["label"] not in pred_dict.keys():
-                pred_dict[row["label"]] = {row["score"]: {"bboxes": [[row["bbox_xmin"], row["bbox_ymin"], row["bbox_xmax"], row["bbox_ymax"]]], "filename": [row["filename"]]}}
-            else:
-                if not row["filename"] in pred_dict[row["label"]].keys():
-                    pred_dict[row["label"]][row["score"]] = {"bboxes": [[row["bbox_xmin"], row["bbox_ymin"], row["bbox_xmax"], row["bbox_ymax"]]], "filename": [row["filename"]]}
-                else:
-                    pred_dict[row["label"]][row["score"]]["bboxes"].append([row["bbox_xmin"], row["bbox_ymin"], row["bbox_xmax"], row["bbox_ymax"]])
-                    pred_dict[row["label"]][row["score"]]["filename"].append(row["filename"])
+        pred_objects = self.get_object_arrays(preds)
+        pred_objects["areas"] = preds[self.AREA_COLUMN].to_numpy(dtype=float)
+        pred_scores, pred_filenames = preds["score"].to_numpy(dtype=float), preds["filename"].to_numpy(dtype=object)
+        for label, indices in preds.groupby("label", sort=False).indices.items():
+            # the rows of a label are contiguous because the dataframe is sorted by label
+            group = slice(indices[0], indices[-1]+1)
+            pred_dict[label] = {"scores": pred_scores[group], "filename": pred_filenames[group]}
+            for key, objects in pred_objects.items():
+                pred_dict[label][key] = objects[group]
 
         gt_dict = {}
-        for index, row in ground_truth.iterrows():
-            if row["label"] not in gt_dict.keys():
-                gt_dict[row["label"]] = {row["filename"]: [[row["bbox_xmin"], row["bbox_ymin"], row["bbox_xmax"], row["bbox_ymax"]]]}
-            else:
-                if not row["filename"] in gt_dict[row["label"]].keys():
-                    gt_dict[row["label"]][row["filename"]] = [[row["bbox_xmin"], row["bbox_ymin"], row["bbox_xmax"], row["bbox_ymax"]]]
-                else:
-                    gt_dict[row["label"]][row["filename"]].append([row["bbox_xmin"], row["bbox_ymin"], row["bbox_xmax"], row["bbox_ymax"]])
+        gt_objects = self.get_object_arrays(ground_truth)
+        gt_objects["areas"] = ground_truth[self.AREA_COLUMN].to_numpy(dtype=float)
+        for (label, filename), indices in ground_truth.groupby(["label", "filename"], sort=False).indices.items():
+            group = slice(indices[0], indices[-1]+1)
+            if label not in gt_dict.keys():
+                gt_dict[label] = {}
+            gt_dict[label][filename] = {key: objects[group] for key, objects in gt_objects.items()}
         return gt_dict, pred_dict
 
     @staticmethod
-    def filter_data(df, filter_key_word):
+    def is_outside_area_range(objects, area_range):
+        """Returns a boolean array that marks the objects ({"areas": areas, ...}) outside of area_range (min_area <= area < max_area)."""
+        return (objects["areas"] < area_range[0]) | (objects["areas"] >= area_range[1])
+
+    @classmethod
+    def filter_data(cls, df, filter_key_word):
         if filter_key_word == "AP":
             return df
-        elif filter_key_word == "AP_small":
-            return df[(df["area"] < 32**2)]
-        elif filter_key_word == "AP_medium":
-            return df[((32**2 <= df["area"]) & (df["area"] < 96**2))]
-        elif filter_key_word == "AP_large":
-            return df[96**2 <= df["area"]]
+        min_area, max_area = cls.AREA_RANGES[filter_key_word]
+        return df[(min_area <= df[cls.AREA_COLUMN]) & (df[cls.AREA_COLUMN] < max_area)]
+
+    def get_worker(self):
+        """Returns a copy of the object without the data, only the prepared data of a work unit has to be send to a worker process."""
+        worker = copy(self)
+        worker.data = None
+        return worker
+
+    def evaluate_work_unit(self, gt, pred):
+        """Returns {iou: data} for an area range and class or {area range name: {iou: data}} for a class if the area_range_mode is "ignore"."""
+        if self.area_range_mode == "ignore":
+            return self.get_precision_and_recall_for_area_ranges(gt, pred, self.ious)
+        return self.get_precision_and_recall_for_ious(gt, pred, self.ious)
+
+    def evaluate_work_units(self, work_units):
+        """Returns the result of evaluate_work_unit for every (gt, pred) work unit, in parallel if n_jobs != 1."""
+        n_jobs = min(effective_n_jobs(self.n_jobs), len(work_units))
+        if n_jobs <= 1:
+            return [self.evaluate_work_unit(gt, pred) for gt, pred in work_units]
+        worker = self.get_worker()
+        # start the largest work units first to keep the workers busy until the end
+        order = sorted(range(len(work_units)), key=lambda index: 0 if work_units[index][1] is None else -len(work_units[index][1]["scores"]))
+        results = Parallel(n_jobs=n_jobs, backend=self.backend)(
+            delayed(worker.evaluate_work_unit)(*work_units[index]) for index in order
+        )
+        ordered_results = [None]*len(work_units)
+        for index, result in zip(order, results):
+            ordered_results[index] = result
+        return ordered_results
 
     def get_metric_data(self):
-        analysis_data = {}
-        for analysis_type in ["AP", "AP_small", "AP_medium", "AP_large"]:
-            filtered_df = self.filter_data(self.data, analysis_type)
+        work_unit_keys, work_units = [], []
+        # like in COCO the detections are limited before the area ranges are applied
+        data = self.select_top_detections(self.data)
+        # with the area_range_mode "ignore" all area ranges of a class are derived from the same ious
+        for analysis_type in ["AP"] if self.area_range_mode == "ignore" else self.AREA_RANGES.keys():
+            filtered_df = self.filter_data(data, analysis_type)
             gt_dict, pred_dict = self.prepare_data(filtered_df)
-            class_names = gt_dict.keys()
-            class_data = {}
-            for class_name in class_names:
-                iou_data = {}
-                for iou in self.ious:
-                    res = self.get_precision_and_recall(gt_dict[class_name], pred_dict.get(class_name, None), iou)
-                    iou_data[iou] = res
-                iou_data["ap"] = np.array([iou["ap"] for iou in iou_data.values()]).mean()
-                class_data[class_name] = iou_data
-            class_data["map"] = np.array([class_entry["ap"] for class_entry in class_data.values()]).mean() if len(class_data.values()) > 0 else 0
-            analysis_data[analysis_type] = class_data
+            for class_name in gt_dict.keys():
+                work_unit_keys.append((analysis_type, class_name))
+                work_units.append((gt_dict[class_name], pred_dict.get(class_name, None)))
+        # all iou thresholds of a work unit are evaluated with a single matching pass
+        results = self.evaluate_work_units(work_units)
+        if self.area_range_mode == "ignore":
+            class_names, area_range_results = [class_name for _, class_name in work_unit_keys], results
+            work_unit_keys, results = [], []
+            for class_name, area_range_data in zip(class_names, area_range_results):
+                for analysis_type, iou_data in area_range_data.items():
+                    work_unit_keys.append((analysis_type, class_name))
+                    results.append(iou_data)
+
+        analysis_data = {analysis_type: {} for analysis_type in self.AREA_RANGES.keys()}
+        for (analysis_type, class_name), iou_data in zip(work_unit_keys, results):
+            analysis_data[analysis_type][class_name] = self.summarize_ious(iou_data)
+        for class_data in analysis_data.values():
+            self.summarize_classes(class_data)
         return analysis_data
 
 # Cell
-class APInstanceSegmentation:
-    """A faster implementaiton for the (m)AP scores."""
-    def __init__(self, data, ious=None):
-        self.data = data
-        self.ious = ious if ious is not None else np.arange(0.5, 1, 0.05).round(2)
-        self.metric_data = self.get_metric_data()
+class APInstanceSegmentation(APObjectDetection):
+    """A faster implementaiton for the (m)AP scores of instance segmentation results, the masks are matched on their run-length encodings (same arguments as APObjectDetection)."""
+    ADDITIONAL_STATS_KEYS = [
+        "x_center_offsets", "y_center_offsets", "center_distances", "unused_gt_mask_areas_normalized", "unused_pred_mask_areas_normalized",
+        "used_gt_mask_areas_normalized", "used_pred_mask_areas_normalized"
+    ]
+    # the masks are matched, the stored bboxes are only used for the offsets of the additional stats
+    OBJECT_KEYS = ["masks", "bboxes"]
+    AREA_COLUMN = "bbox_area"
 
     @staticmethod
     def calculate_iou(pred_mask_array, gt_mask_array):
@@ -287,242 +683,289 @@ class APInstanceSegmentation:
         iou = intersection_area / (non_intersecting_area + intersection_area)
         return iou, intersection_area
 
-    def get_image_stats(self, gt_masks, pred_masks, iou_threshold):
-        """
-        Returns: tp, fp, fn, :if additional_stats: x_center_offsets, y_center_offsets, center_distances, used_gt_mask_areas_normalized, used_pred_mask_areas_normalized, used_gt_mask_areas_normalized, used_pred_mask_areas_normalized
-        """
-        if pred_masks is None:
-            return 0,  0, len(gt_masks["masks"]), [], [], [], [], [], [], []
-        if len(gt_masks) == 0:
-            return 0, len(pred_masks["masks"]), 0, [], [], [], [], [], [], []
-        else:
-            # calculate ious and log their mapping with mask indices
-            gt_mask_indices = []
-            pred_mask_indices = []
-            ious = []
-            gt_mask_areas = []
-            pred_mask_areas = []
-            intersection_areas = []
-            for pred_mask_index, (pred_mask, pred_area) in enumerate(zip(pred_masks["masks"], pred_masks["areas"])):
-                for gt_mask_index, (gt_mask, gt_area) in enumerate(zip(gt_masks["masks"], gt_masks["areas"])):
-                    iou, intersection_area = self.calculate_iou(pred_mask, gt_mask)
-                    if iou >= iou_threshold:
-                        gt_mask_indices.append(gt_mask_index)
-                        pred_mask_indices.append(pred_mask_index)
-                        ious.append(iou)
-                        pred_mask_areas.append(pred_area)
-                        gt_mask_areas.append(gt_area)
-                        intersection_areas.append(intersection_area)
-            # check if any hits happend
-            if len(ious) == 0:
-                return 0, len(pred_masks["masks"]), len(gt_masks["masks"]), [], [], [], [], [], [], []
-            else:
-                # select matches based on iou
-                indices_descending = np.argsort(ious)[::-1]
-                gt_match_indices = []
-                pred_match_indices = []
-                x_center_offsets = []
-                y_center_offsets = []
-                center_distances = []
-                unused_gt_mask_areas_normalized = []
-                unused_pred_mask_areas_normalized = []
-                used_gt_mask_areas_normalized = []
-                used_pred_mask_areas_normalized = []
-                for index in indices_descending:
-                    gt_index = gt_mask_indices[index]
-                    pred_index = pred_mask_indices[index]
-                    if (gt_index not in gt_match_indices) and (pred_index not in pred_match_indices):
-                        gt_match_indices.append(gt_index)
-                        pred_match_indices.append(pred_index)
-                        # calculate additional stats
-                        pred_mask_array = pred_masks["masks"][pred_mask_index]
-                        pred_mask_y_indices, pred_mask_x_indices = np.where(pred_mask_array == 1)
-                        pred_mask_x1, pred_mask_y1, pred_mask_x2, pred_mask_y2 = pred_mask_x_indices[0], pred_mask_x_indices[-1], pred_mask_y_indices[0], pred_mask_y_indices[-1]
-
-                        gt_mask_array = gt_masks["masks"][gt_mask_index]
-                        gt_mask_y_indices, gt_mask_x_indices = np.where(gt_mask_array == 1)
-                        gt_mask_x1, gt_mask_y1, gt_mask_x2, gt_mask_y2 = gt_mask_x_indices[0], gt_mask_x_indices[-1], gt_mask_y_indices[0], gt_mask_y_indices[-1]
-
-                        x_center_offset = ((pred_mask_x1+pred_mask_x2)-(gt_mask_x1+gt_mask_x2))/2
-                        y_center_offset = ((pred_mask_y1+pred_mask_y2)-(gt_mask_y1+gt_mask_y2))/2
-                        x_center_offsets.append(x_center_offset)
-                        y_center_offsets.append(y_center_offset)
-                        center_distances.append((x_center_offset**2+y_center_offset**2)**0.5)
-                        unused_gt_mask_areas_normalized.append((gt_mask_areas[index]-intersection_areas[index])/gt_mask_areas[index])
-                        unused_pred_mask_areas_normalized.append((pred_mask_areas[index]-intersection_areas[index])/pred_mask_areas[index])
-                        used_gt_mask_areas_normalized.append(intersection_areas[index]/gt_mask_areas[index])
-                        used_pred_mask_areas_normalized.append(intersection_areas[index]/pred_mask_areas[index])
-
-                return len(gt_match_indices), len(pred_masks["masks"]) - len(pred_match_indices), len(gt_masks["masks"]) - len(gt_match_indices), x_center_offsets, y_center_offsets, center_distances, unused_gt_mask_areas_normalized, unused_pred_mask_areas_normalized, used_gt_mask_areas_normalized, used_pred_mask_areas_normalized
+    @staticmethod
+    def calculate_rle_iou_matrix(pred_rles, gt_rles):
+        """Calculates the ious directly on the run-length encodings (without decoding the masks) for all combinations of pred_rles and gt_rles.
+        pycocotools rejects the pairs with bounding boxes that don't intersect before comparing the runs, which only cover the columns of the objects.
+        Returns the ious (N, M), pred mask areas (N,), gt mask areas (M,) and intersection areas (N, M)."""
+        ious = np.asarray(mask_utils.iou(list(pred_rles), list(gt_rles), [0]*len(gt_rles)), dtype=float).reshape(len(pred_rles), len(gt_rles))
+        pred_mask_areas = mask_utils.area(list(pred_rles)).astype(float)
+        gt_mask_areas = mask_utils.area(list(gt_rles)).astype(float)
+        # iou = I / (A + B - I) => I = iou * (A + B) / (1 + iou)
+        intersection_areas = ious * (pred_mask_areas[:, None] + gt_mask_areas[None, :]) / (1 + ious)
+        return ious, pred_mask_areas, gt_mask_areas, intersection_areas
+
+    def calculate_object_ious(self, pred_objects, gt_objects):
+        """Returns the ious, pred areas, gt areas and intersection areas for all combinations of the masks of an image."""
+        return self.calculate_rle_iou_matrix(pred_objects["masks"], gt_objects["masks"])
+
+    def get_object_boxes(self, objects):
+        """Returns the bounding boxes (N, 4) of the masks, masks can only overlap if their bounding boxes overlap."""
+        return self.rles_to_boxes(objects["masks"])
+
+    def calculate_pair_ious(self, pred_objects, gt_objects, pred_indices, gt_indices):
+        """Returns the ious (P,), pred mask areas (N,), gt mask areas (M,) and intersection areas (P,) for the pairs (pred_indices[i], gt_indices[i]),
+        the run-length encodings of every prediction are only compared to the gts of its pairs."""
+        pred_rles, gt_rles = list(pred_objects["masks"]), list(gt_objects["masks"])
+        pred_mask_areas = mask_utils.area(pred_rles).astype(float) if len(pred_rles) > 0 else np.zeros(0)
+        gt_mask_areas = mask_utils.area(gt_rles).astype(float) if len(gt_rles) > 0 else np.zeros(0)
+        ious = np.zeros(len(pred_indices))
+        # the pairs are sorted by the pred index
+        pair_starts = np.flatnonzero(np.diff(pred_indices, prepend=-1))
+        for pair_start, pair_end in zip(pair_starts, np.append(pair_starts[1:], len(pred_indices))):
+            pair_gt_rles = [gt_rles[gt_index] for gt_index in gt_indices[pair_start:pair_end]]
+            ious[pair_start:pair_end] = np.asarray(mask_utils.iou([pred_rles[pred_indices[pair_start]]], pair_gt_rles, [0]*len(pair_gt_rles)), dtype=float).reshape(-1)
+        intersection_areas = ious * (pred_mask_areas[pred_indices] + gt_mask_areas[gt_indices]) / (1 + ious)
+        return ious, pred_mask_areas, gt_mask_areas, intersection_areas
 
-    def get_precision_and_recall(self, gt, pred, iou):
-        """gt and pred need to be sored dicts with the lowest score being the first entry"""
-        tps, fps, fns = [], [], []
-        precisions, recalls, score_thresholds = [], [], []
-        x_center_offsets, y_center_offsets, center_distances, unused_gt_mask_areas_normalized, unused_pred_mask_areas_normalized, used_gt_mask_areas_normalized, used_pred_mask_areas_normalized = [], [], [], [], [], [], []
+    @staticmethod
+    def rles_to_boxes(rles):
+        """Returns the bounding boxes (xmin, ymin, xmax, ymax) of the masks without decoding them."""
+        if len(rles) == 0:
+            return np.zeros((0, 4))
+        boxes = mask_utils.toBbox(list(rles)).reshape(-1, 4)
+        boxes[:, 2:] += boxes[:, :2]
+        return boxes
+
+    def get_object_arrays(self, df):
+        """Returns the masks of the rows of df as run-length encodings, they are never decoded for the metric calculation, and the stored bboxes of the rows.
+        The offsets of the additional stats are calculated with the stored bboxes (like for object detection)."""
+        masks = np.empty(len(df), dtype=object)
+        masks[:] = [string_to_erles(erles) for erles in df["erles_corrected"]]
+        return {"masks": masks, "bboxes": df[["bbox_xmin", "bbox_ymin", "bbox_xmax", "bbox_ymax"]].to_numpy(dtype=float)}
 
-        if pred is None:
-            return {
-                "tp": np.array([0]), "fp": [sum(len(gt_masks) for gt_masks in gt.values())], "fn": np.array([0]),
-                "precision": np.array([0]), "recall": np.array([0]), "scores": np.array([0]),
-                "ap11": 0, "ap": 0, "monotonic_recalls": np.array([0]), "monotonic_precisions": np.array([0]),
-                "ap11_recalls": np.array([0]), "ap11_precisions": np.array([0]), "x_center_offsets": np.array([0]),
-                "y_center_offsets": np.array([0]), "center_distances": np.array([0]),
-                "unused_gt_mask_areas_normalized": np.array([0]), "unused_pred_mask_areas_normalized": np.array([0]),
-                "used_gt_mask_areas_normalized": np.array([0]), "used_pred_mask_areas_normalized": np.array([0])
-            }, iou
-
-        scores = list(pred.keys())
-        pred_masks = list(pred.values())
-        # loop over scores to calculate statistics for the score
-        for score_index, score in enumerate(scores):
-            score_tp, score_fp, score_fn = 0, 0, 0
-            score_x_center_offsets, score_y_center_offsets, score_center_distances, score_unused_gt_mask_areas_normalized, score_unused_pred_mask_areas_normalized = [], [], [], [], []
-            score_used_gt_mask_areas_normalized, score_used_pred_mask_areas_normalized = [], []
-            # create dict with active predicitons (prediction with the same or higher score)
-            active_preds = {"masks": [], "areas": []}
-            for pred_entry in pred_masks[score_index:]:
-                for filename, mask, area in zip(pred_entry["filename"], pred_entry["masks"], pred_entry["areas"]):
-                    if filename not in active_preds.keys():
-                        active_preds[filename] = {"masks": [mask], "areas": [area]}
-                    else:
-                        active_preds[filename]["masks"].append(mask)
-                        active_preds[filename]["areas"].append(area)
-            # loop over gt images
-            for filename, image_gt_masks in gt.items():
-                img_tp, img_fp, img_fn, img_x_center_offsets, img_y_center_offsets, img_center_distances, img_unused_gt_mask_areas_normalized, img_unused_pred_mask_areas_normalized, img_used_gt_mask_areas_normalized, img_used_pred_mask_areas_normalized = self.get_image_stats(image_gt_masks, active_preds.get(filename, None), iou)
-                score_tp += img_tp
-                score_fp += img_fp
-                score_fn += img_fn
-                score_x_center_offsets += img_x_center_offsets
-                score_y_center_offsets += img_y_center_offsets
-                score_center_distances += img_center_distances
-                score_unused_gt_mask_areas_normalized += img_unused_gt_mask_areas_normalized
-                score_unused_pred_mask_areas_normalized += img_unused_pred_mask_areas_normalized
-                score_used_gt_mask_areas_normalized += img_used_gt_mask_areas_normalized
-                score_used_pred_mask_areas_normalized += img_used_pred_mask_areas_normalized
-            # calculate precision and recall for the threshold
-            score_precision = score_tp/(score_tp + score_fp) if score_tp + score_fp > 0 else 0
-            score_recall = score_tp/(score_tp + score_fn) if score_tp + score_fn > 0 else 0
-
-            tps.append(score_tp)
-            fps.append(score_fp)
-            fns.append(score_fn)
-            precisions.append(score_precision)
-            recalls.append(score_recall)
-            score_thresholds.append(score)
-
-            x_center_offsets.append(score_x_center_offsets)
-            y_center_offsets.append(score_y_center_offsets)
-            center_distances.append(score_center_distances)
-            unused_gt_mask_areas_normalized.append(score_unused_gt_mask_areas_normalized)
-            unused_pred_mask_areas_normalized.append(score_unused_pred_mask_areas_normalized)
-            used_gt_mask_areas_normalized.append(score_used_gt_mask_areas_normalized)
-            used_pred_mask_areas_normalized.append(score_used_pred_mask_areas_normalized)
+# Cell
+class APAccumulator:
+    """Base class for the accumulators, which compute the AP metrics batch by batch (e.g. during a long validation run).
+    Every update matches the predictions of its images (COCO-style, like the evaluation_mode "cumulative") and keeps per area range and class
+    the scores, tp flags and matched stats as arrays. get_ap and get_metric_data only sort and sum the accumulated matches, nothing is matched again.
+    All ground truths and predictions of an image need to be in the same update. Needs to be combined with APObjectDetection or APInstanceSegmentation."""
+    def __init__(self, ious=None, area_range_mode="filter", additional_stats=True, max_dets=None, spatial_index_min_boxes=None):
+        if area_range_mode not in self.AREA_RANGE_MODES:
+            raise ValueError("area_range_mode has to be one of " + str(self.AREA_RANGE_MODES) + ".")
+        self.data = None
+        self.ious = ious if ious is not None else np.arange(0.5, 1, 0.05).round(2)
+        self.evaluation_mode = "cumulative"
+        self.n_jobs = 1
+        self.backend = "loky"
+        self.area_range_mode = area_range_mode
+        self.additional_stats = additional_stats
+        self.max_dets = max_dets
+        self.spatial_index_min_boxes = spatial_index_min_boxes if spatial_index_min_boxes is not None else self.SPATIAL_INDEX_MIN_BOXES
+        # {area range name: {class name: [(scores, is_tp, is_ignored, matched_stats, num_gt_objects), ...]}}
+        self.matches = {name: {} for name in self.AREA_RANGES.keys()}
+        self._metric_data = None
+
+    def update(self, df):
+        """Matches the results in df (same format as the data of the AP classes) and adds them to the accumulated matches."""
+        df = self.select_top_detections(df)
+        if self.area_range_mode == "ignore":
+            area_range_batches = [(self.AREA_RANGES, df)]
+        else:
+            # the objects are already filtered, so nothing is ignored
+            area_range_batches = [({name: (-np.inf, np.inf)}, self.filter_data(df, name)) for name in self.AREA_RANGES.keys()]
+        for area_ranges, filtered_df in area_range_batches:
+            gt_dict, pred_dict = self.prepare_data(filtered_df)
+            for class_name in set(gt_dict.keys()) | set(pred_dict.keys()):
+                area_range_matches = self.match_cumulative_area_ranges(gt_dict.get(class_name, {}), pred_dict.get(class_name, None), self.ious, area_ranges)
+                for name, matches in area_range_matches.items():
+                    self.matches[name].setdefault(class_name, []).append(matches)
+        self._metric_data = None
+
+    def get_accumulated_matches(self, name, class_name):
+        """Merges the matches of all updates for an area range and class into one set of arrays (sorted by descending score) and returns them."""
+        class_matches = self.matches[name][class_name]
+        if len(class_matches) > 1:
+            scores, is_tp, is_ignored, matched_stats, num_gt_objects = zip(*class_matches)
+            # stable, so that the order of equal scores within an image stays the same
+            order = np.argsort(-np.concatenate(scores), kind="stable")
+            class_matches[:] = [(
+                np.concatenate(scores)[order], np.concatenate(is_tp, axis=1)[:, order], np.concatenate(is_ignored, axis=1)[:, order],
+                np.concatenate(matched_stats, axis=1)[:, order], sum(num_gt_objects)
+            )]
+        return class_matches[0]
+
+    def get_class_data(self, name, class_name):
+        """Returns {iou: precision and recall data} for an area range and class or None if the class has no gts in the area range."""
+        scores, is_tp, is_ignored, matched_stats, num_gt_objects = self.get_accumulated_matches(name, class_name)
+        if num_gt_objects == 0:
+            return None
+        if len(scores) == 0:
+            return {iou: self.get_no_pred_data(num_gt_objects) for iou in self.ious}
+        sweeps = self.summarize_cumulative_matches(scores, is_tp, is_ignored, matched_stats, num_gt_objects)
+        return {iou: self.summarize_sweep(*sweep) for iou, sweep in zip(self.ious, sweeps)}
+
+    def get_ap(self):
+        """Returns the current AP of every area range and class and the mAP ({area range name: {class name: ap, "map": map}})."""
+        ap_data = {}
+        for name, class_matches in self.matches.items():
+            ap_data[name] = {}
+            for class_name in sorted(class_matches.keys()):
+                iou_data = self.get_class_data(name, class_name)
+                if iou_data is not None:
+                    ap_data[name][class_name] = np.array([iou["ap"] for iou in iou_data.values()]).mean()
+            ap_data[name]["map"] = np.array(list(ap_data[name].values())).mean() if len(ap_data[name]) > 0 else 0
+        return ap_data
 
-        # convert data to np.arrays for further processing
-        tps = np.array(tps)
-        fps = np.array(fps)
-        fns = np.array(fns)
-        precisions = np.array(precisions)
-        recalls = np.array(recalls)
-        score_thresholds = np.array(score_thresholds)
+    def get_metric_data(self):
+        """Returns the accumulated results in the metric_data format of the AP classes."""
+        analysis_data = {}
+        for name, class_matches in self.matches.items():
+            class_data = {}
+            for class_name in sorted(class_matches.keys()):
+                iou_data = self.get_class_data(name, class_name)
+                if iou_data is not None:
+                    class_data[class_name] = self.summarize_ious(iou_data)
+            analysis_data[name] = self.summarize_classes(class_data)
+        return analysis_data
 
-        # calculate additional stats
+    @property
+    def metric_data(self):
+        if self._metric_data is None:
+            self._metric_data = self.get_metric_data()
+        return self._metric_data
 
-        # AP11
-        precisions_at_recall_value = []
-        for recall_value in np.linspace(0.0, 1.0, 11):
-            indices = np.argwhere(np.array(recalls) >= recall_value).flatten()
-            precision_max = max(precisions[indices]) if indices.size > 0 else 0
-            precisions_at_recall_value.append(precision_max)
-        ap11 = np.mean(precisions_at_recall_value)
+# Cell
+class APObjectDetectionAccumulator(APAccumulator, APObjectDetection):
+    """Accumulates the (m)AP scores of object detection results batch by batch."""
+    pass
 
-        #AP
-        sorted_indices = np.argsort(recalls)
-        sorted_recalls = recalls[sorted_indices]
-        sorted_precision = precisions[sorted_indices]
-        # make the prefrom joblib import Parallel, delayedcision values monotonically
-        calc_recalls = [0] + sorted_recalls.tolist() + [1]
-        calc_precisions = [0] + sorted_precision.tolist() + [0]
-        for i in range(len(calc_recalls)-2, -1, -1):
-            calc_precisions[i] = max(calc_precisions[i], calc_precisions[i+1])
-        # get indices where the recall value changes
-        changing_index_list = []
-        for i in range(1, len(calc_recalls)):
-            if calc_recalls[i] != calc_recalls[i-1]:
-                changing_index_list.append(i)
-        ap = 0.0
-        for i in changing_index_list:
-            ap += ((calc_recalls[i]-calc_recalls[i-1])*calc_precisions[i])
+# Cell
+class APInstanceSegmentationAccumulator(APAccumulator, APInstanceSegmentation):
+    """Accumulates the (m)AP scores of instance segmentation results batch by batch."""
+    pass
 
-        return {
-            "tp": tps, "fp": fps, "fn": fns, "precision": precisions, "recall": recalls, "scores": score_thresholds,
-            "ap11": ap11, "ap": ap, "monotonic_recalls": np.array(calc_recalls), "monotonic_precisions": np.array(calc_precisions),
-            "ap11_recalls": np.linspace(0.0, 1.0, 11), "ap11_precisions": np.array(precisions_at_recall_value), "x_center_offsets": x_center_offsets,
-            "y_center_offsets": y_center_offsets, "center_distances": center_distances,
-            "unused_gt_mask_areas_normalized": unused_gt_mask_areas_normalized, "unused_pred_mask_areas_normalized": unused_pred_mask_areas_normalized,
-            "used_gt_mask_areas_normalized": used_gt_mask_areas_normalized, "used_pred_mask_areas_normalized": used_pred_mask_areas_normalized
-        }, iou
+# Cell
+class MetricDataCache:
+    """Persistent on-disk cache for metric data. Every entry is stored as pickle file named after its key (e.g. a content hash of the data).
+    Loading an entry unpickles it, so the cache_dir must only be writable by trusted users.
+    If the entries take more than max_size_bytes the least recently used ones are removed.
+    The default cache_dir is the environment variable ICEVISION_DASHBOARDS_CACHE_DIR or ~/.cache/icevision_dashboards/metric_data."""
+    def __init__(self, cache_dir=None, max_size_bytes=2**30):
+        if cache_dir is None:
+            cache_dir = os.environ.get("ICEVISION_DASHBOARDS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "icevision_dashboards", "metric_data"))
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def load(self, key):
+        """Returns the cached value for key or None if there is none."""
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # broken or outdated entry
+            os.remove(path)
+            return None
+        self.mark_used(path)
+        return value
+
+    def save(self, key, value):
+        """Stores value under key and evicts the least recently used entries if the cache is too large."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key)
+        # write to a temporary file first, so that a cache entry is never read while it is written
+        temp_path = path + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.mark_used(path)
+        self.evict()
 
     @staticmethod
-    def prepare_data(df):
-        ground_truth, preds = df[df["is_prediction"] == False].sort_values("score"), df[df["is_prediction"] == True].sort_values("score")
+    def mark_used(path):
+        """Sets the modification time, which marks the last use for the eviction, to the current time.
+        The time is passed explicitly, os.utime without times and file writes use the coarse clock of the file system and uses in quick succession would get the same time."""
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is smaller than max_size_bytes."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                entry_stats = entry.stat()
+                entries.append((entry_stats.st_mtime, entry_stats.st_size, entry.path))
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if cache_size <= self.max_size_bytes:
+                break
+            os.remove(path)
+            cache_size -= size
+
+    def clear(self):
+        """Removes all entries."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
 
-        pred_dict = {}
-        for index, row in preds.iterrows():
-            if row["label"] not in pred_dict.keys():
-                pred_dict[row["label"]] = {row["score"]: {"masks": [mask_utils.decode([string_to_erles(row["erles_corrected"])]).transpose(2, 0, 1)[0,:,:]], "filename": [row["filename"]], "areas": [row["mask_area"]]}}
-            else:
-                if not row["filename"] in pred_dict[row["label"]].keys():
-                    pred_dict[row["label"]][row["score"]] = {"masks": [mask_utils.decode([string_to_erles(row["erles_corrected"])]).transpose(2, 0, 1)[0,:,:]], "filename": [row["filename"]], "areas": [row["mask_area"]]}
-                else:
-                    pred_dict[row["label"]][row["score"]]["maskes"].append(mask_utils.decode([string_to_erles(row["erles_corrected"])]).transpose(2, 0, 1)[0,:,:])
-                    pred_dict[row["label"]][row["score"]]["filename"].append(row["filename"])
-                    pred_dict[row["label"]][row["score"]]["areas"].append(row["mask_area"])
+# Cell
+class ClassConfusionMatrix:
+    """Confusion matrix of the classes of object detection results. The objects of an image are matched class-agnostic (greedy, in the order of descending iou).
+    A match counts for (gt label, pred label), an unmatched gt for (gt label, background) and an unmatched prediction for (background, pred label).
+    The ious of every image are calculated once, so get_confusion_matrix is fast for any iou and score threshold."""
+    BACKGROUND = "background"
 
-        gt_dict = {}
-        for index, row in ground_truth.iterrows():
-            if row["label"] not in gt_dict.keys():
-                gt_dict[row["label"]] = {row["filename"]: {"masks": [mask_utils.decode([string_to_erles(row["erles_corrected"])]).transpose(2, 0, 1)[0,:,:]], "areas": [row["mask_area"]]}}
+    def __init__(self, data):
+        self.data = data
+        self.labels = sorted(str(label) for label in data["label"].unique())
+        self.image_data = self.prepare_data(data)
+
+    def get_object_arrays(self, df):
+        return df[["bbox_xmin", "bbox_ymin", "bbox_xmax", "bbox_ymax"]].to_numpy(dtype=float)
+
+    def calculate_ious(self, pred_objects, gt_objects):
+        return APObjectDetection.calculate_iou_matrix(pred_objects, gt_objects)[0]
+
+    def prepare_data(self, df):
+        """Returns (gt label indices, pred label indices, pred scores, ious (num_preds, num_gts)) for every image."""
+        objects = self.get_object_arrays(df)
+        label_indices = pd.Index(self.labels).get_indexer(df["label"].astype(str))
+        is_prediction = df["is_prediction"].to_numpy(dtype=bool)
+        scores = df["score"].to_numpy(dtype=float)
+        image_data = []
+        for indices in df.groupby("filename", sort=False).indices.values():
+            pred_indices, gt_indices = indices[is_prediction[indices]], indices[~is_prediction[indices]]
+            if len(pred_indices) > 0 and len(gt_indices) > 0:
+                ious = self.calculate_ious(objects[pred_indices], objects[gt_indices])
             else:
-                if not row["filename"] in gt_dict[row["label"]].keys():
-                    gt_dict[row["label"]][row["filename"]] = {"masks": [mask_utils.decode([string_to_erles(row["erles_corrected"])]).transpose(2, 0, 1)[0,:,:]], "areas": [row["mask_area"]]}
-                else:
-                    gt_dict[row["label"]][row["filename"]]["masks"].append(mask_utils.decode([string_to_erles(row["erles_corrected"])]).transpose(2, 0, 1)[0,:,:])
-                    gt_dict[row["label"]][row["filename"]]["areas"].append(row["mask_area"])
-        return gt_dict, pred_dict
-
-    @staticmethod
-    def filter_data(df, filter_key_word):
-        if filter_key_word == "AP":
-            return df
-        elif filter_key_word == "AP_small":
-            return df[(df["bbox_area"] < 32**2)]
-        elif filter_key_word == "AP_medium":
-            return df[((32**2 <= df["bbox_area"]) & (df["bbox_area"] < 96**2))]
-        elif filter_key_word == "AP_large":
-            return df[96**2 <= df["bbox_area"]]
+                ious = np.zeros((len(pred_indices), len(gt_indices)))
+            image_data.append((label_indices[gt_indices], label_indices[pred_indices], scores[pred_indices], ious))
+        return image_data
+
+    def get_confusion_matrix(self, iou_threshold=0.5, score_threshold=0.5):
+        """Returns the confusion matrix as dataframe, the index are the gt labels and the columns the pred labels (both plus background)."""
+        background = len(self.labels)
+        gt_rows, pred_cols = [], []
+        for gt_labels, pred_labels, pred_scores, ious in self.image_data:
+            active = pred_scores >= score_threshold
+            pred_labels, ious = pred_labels[active], ious[active]
+            pred_indices, gt_indices = np.nonzero(ious >= iou_threshold)
+            accepted_pairs = APObjectDetection.greedy_matching(pred_indices, gt_indices, ious[pred_indices, gt_indices])
+            pred_matched, gt_matched = np.zeros(len(pred_labels), dtype=bool), np.zeros(len(gt_labels), dtype=bool)
+            pred_matched[pred_indices[accepted_pairs]] = True
+            gt_matched[gt_indices[accepted_pairs]] = True
+            gt_rows += [gt_labels[gt_indices[accepted_pairs]], gt_labels[~gt_matched], np.full((~pred_matched).sum(), background)]
+            pred_cols += [pred_labels[pred_indices[accepted_pairs]], np.full((~gt_matched).sum(), background), pred_labels[~pred_matched]]
+        size = len(self.labels) + 1
+        cells = np.concatenate(gt_rows).astype(int)*size + np.concatenate(pred_cols).astype(int) if len(gt_rows) > 0 else np.zeros(0, dtype=int)
+        confusion_matrix = np.bincount(cells, minlength=size**2).reshape(size, size)
+        return pd.DataFrame(confusion_matrix, index=pd.Index(self.labels + [self.BACKGROUND], name="gt"), columns=pd.Index(self.labels + [self.BACKGROUND], name="prediction"))
+
+    def get_heatmap_data(self, iou_threshold=0.5, score_threshold=0.5):
+        """Returns the confusion matrix in the long format of the heatmap plot (columns gt, prediction and count)."""
+        return self.get_confusion_matrix(iou_threshold, score_threshold).stack().rename("count").reset_index()
 
-    def get_metric_data(self):
-        analysis_data = {}
-        for analysis_type in ["AP", "AP_small", "AP_medium", "AP_large"]:
-            filtered_df = self.filter_data(self.data, analysis_type)
-            gt_dict, pred_dict = self.prepare_data(filtered_df)
-            class_names = gt_dict.keys()
-            class_data = {}
-            for class_name in class_names:
-                iou_data = {}
-                results = Parallel(n_jobs=10)(delayed(self.get_precision_and_recall)(gt_dict[class_name], pred_dict.get(class_name, None), iou) for iou in self.ious)
-                for res in results:
-                    iou_data[res[1]] = res[0]
-
-                # for iou in self.ious:
-                #     res = self.get_precision_and_recall(gt_dict[class_name], pred_dict.get(class_name, None), iou)
-                #     iou_data[res[1]] = res[0]
-
-                iou_data["ap"] = np.array([iou["ap"] for iou in iou_data.values()]).mean()
-                class_data[class_name] = iou_data
-            class_data["map"] = np.array([class_entry["ap"] for class_entry in class_data.values()]).mean() if len(class_data.values()) > 0 else 0
-            analysis_data[analysis_type] = class_data
-        return analysis_data
\ No newline at end of file
+# Cell
+class ClassConfusionMatrixInstanceSegmentation(ClassConfusionMatrix):
+    """Confusion matrix of the classes of instance segmentation results, the objects are matched with the mask ious."""
+    def get_object_arrays(self, df):
+        masks = np.empty(len(df), dtype=object)
+        masks[:] = [string_to_erles(erles) for erles in df["erles_corrected"]]
+        return masks
+
+    def calculate_ious(self, pred_objects, gt_objects):
+        return APInstanceSegmentation.calculate_rle_iou_matrix(pred_objects, gt_objects)[0]
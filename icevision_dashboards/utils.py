@@ -1,11 +1,17 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: nbs/utils.ipynb (unless otherwise specified).
 
-__all__ = ['erles_to_string', 'erles_to_counts_to_utf8', 'string_to_erles', 'correct_mask', 'decorrect_mask']
+__all__ = ['erles_to_string', 'erles_to_counts_to_utf8', 'string_to_erles', 'erles_to_areas', 'correct_mask',
+           'decorrect_mask', 'encode_strings', 'decode_strings', 'save_dataframe_as_npz', 'load_npz_arrays',
+           'EncodedStrings', 'load_encoded_dataframe_from_npz', 'load_dataframe_from_npz', 'compact_dataframe',
+           'expand_dataframe', 'memory_usage_report']
 
 # Cell
 import json
+import struct
+import zipfile
 from copy import deepcopy
 import numpy as np
+import pandas as pd
 from PIL import Image
 
 from icevision.core.mask import EncodedRLEs, MaskArray
@@ -31,6 +37,16 @@ def string_to_erles(erles_string):
     erles["counts"] = erles["counts"].encode()
     return erles
 
+# Cell
+def erles_to_areas(erles_list):
+    """Returns the mask areas (number of pixels, same dtype as the sum of the decoded masks) and the image sizes (height*width) for a list of encoded RLEs,
+    the masks are not decoded."""
+    if len(erles_list) == 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=int)
+    mask_areas = mask_utils.area(list(erles_list)).astype(np.uint64)
+    image_sizes = np.array([erles["size"][0]*erles["size"][1] for erles in erles_list], dtype=int)
+    return mask_areas, image_sizes
+
 # Cell
 def correct_mask(mask_array, pad_x, pad_y, width, height):
     # correct mask
@@ -54,4 +70,203 @@ def decorrect_mask(mask_array, pad_x, pad_y, width, height):
     # pad
     corrected_mask_array = np.pad(corrected_mask_array, [[0,0], [pad_y, pad_y], [pad_x, pad_x],])
     corrected_mask = MaskArray(corrected_mask_array)
-    return corrected_mask
\ No newline at end of file
+    return corrected_mask
+
+# Cell
+def encode_strings(strings):
+    """Returns the utf-8 bytes of the strings in one buffer and the offsets of the strings (string i is buffer[offsets[i]:offsets[i+1]]), missing values are stored as empty strings."""
+    encoded_strings = [string.encode("utf-8") if isinstance(string, str) else b"" for string in strings]
+    offsets = np.zeros(len(encoded_strings)+1, dtype=np.int64)
+    np.cumsum([len(encoded_string) for encoded_string in encoded_strings], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded_strings), dtype=np.uint8), offsets
+
+# Cell
+def decode_strings(buffer, offsets, indices=None):
+    """Returns the list of strings (all or the ones at the indices) from a buffer and offsets created by encode_strings, only the bytes of these strings are read."""
+    if indices is None:
+        data, offsets = np.asarray(buffer).tobytes(), offsets.tolist()
+        return [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+    return [np.asarray(buffer[offsets[index]:offsets[index+1]]).tobytes().decode("utf-8") for index in indices]
+
+# Cell
+def save_dataframe_as_npz(path, df, metadata=None, max_category_fraction=0.5):
+    """Saves a dataframe with scalar columns in a npz file without pickling. Numeric, bool and datetime columns are stored with their dtype, categorical columns
+    and string columns with repeated values (at most max_category_fraction unique values per row) as codes and categories, the other string columns as one utf-8 buffer
+    with the offsets of the strings (see encode_strings). Object columns with other values than strings raise a ValueError.
+    The metadata has to be json serializable and is returned by load_dataframe_from_npz."""
+    arrays = {}
+    columns = []
+    for index, (name, column) in enumerate(df.items()):
+        key = "column_"+str(index)
+        column_info = {"name": name, "dtype": str(column.dtype)}
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column_info["kind"] = "categorical"
+            codes, categories = column.cat.codes.to_numpy(), column.cat.categories
+        elif pd.api.types.is_bool_dtype(column.dtype) or pd.api.types.is_numeric_dtype(column.dtype) or pd.api.types.is_datetime64_any_dtype(column.dtype):
+            column_info["kind"] = "array"
+            arrays[key] = column.to_numpy()
+        else:
+            if pd.api.types.is_object_dtype(column.dtype) and not all(isinstance(value, str) for value in column[column.notna()]):
+                raise ValueError("Column "+str(name)+" contains values that are not strings, only string columns can be saved.")
+            # sorted categories, so groupbys of the categorical columns have the same order as for the strings
+            codes, categories = pd.factorize(column, sort=True)
+            categories = pd.Index(categories)
+            if len(categories) <= max_category_fraction*len(column):
+                column_info["kind"] = "factorized"
+            else:
+                column_info["kind"] = "strings"
+                arrays[key+"_buffer"], arrays[key+"_offsets"] = encode_strings(column.tolist())
+                arrays[key+"_missing"] = column.isna().to_numpy()
+        if column_info["kind"] in ["categorical", "factorized"]:
+            arrays[key] = codes
+            if pd.api.types.is_bool_dtype(categories.dtype) or pd.api.types.is_numeric_dtype(categories.dtype) or pd.api.types.is_datetime64_any_dtype(categories.dtype):
+                arrays[key+"_categories"] = categories.to_numpy()
+            else:
+                column_info["string_categories"] = True
+                arrays[key+"_categories_buffer"], arrays[key+"_categories_offsets"] = encode_strings([str(category) for category in categories])
+        columns.append(column_info)
+    arrays["metadata"] = np.array(json.dumps({"columns": columns, "metadata": metadata}, default=str))
+    np.savez(path, **arrays)
+
+# Cell
+def load_npz_arrays(path, mmap=False):
+    """Returns a dict with the arrays of a npz file. With mmap the arrays of uncompressed members (np.savez) are memory-mapped (read only) instead of read into memory."""
+    if not mmap:
+        with np.load(path, allow_pickle=False) as arrays:
+            return {name: arrays[name] for name in arrays.files}
+    arrays = {}
+    with zipfile.ZipFile(path) as zip_file, open(path, "rb") as file:
+        for zip_info in zip_file.infolist():
+            name = zip_info.filename[:-4] if zip_info.filename.endswith(".npy") else zip_info.filename
+            if zip_info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.lib.format.read_array(zip_file.open(zip_info), allow_pickle=False)
+                continue
+            # the array data of a stored member starts after the local file header of the zip file and the npy header
+            file.seek(zip_info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", file.read(30)[26:30])
+            file.seek(zip_info.header_offset+30+name_length+extra_length)
+            version = np.lib.format.read_magic(file)
+            read_array_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_array_header(file)
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=file.tell(), shape=shape, order="F" if fortran_order else "C")
+    return arrays
+
+# Cell
+class EncodedStrings:
+    """Strings stored as one utf-8 buffer with offsets and a missing mask (see encode_strings), the strings are only decoded when they are accessed.
+    Indexing with an integer returns one string (None for missing values), indexing with an array or list of indices returns a list."""
+    def __init__(self, buffer, offsets, missing=None):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.missing = np.zeros(len(offsets)-1, dtype=bool) if missing is None else missing
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getitem__(self, indices):
+        if np.isscalar(indices):
+            return self[[indices]][0]
+        indices = np.arange(len(self))[indices] if isinstance(indices, slice) else np.asarray(indices, dtype=int)
+        strings = decode_strings(self.buffer, self.offsets, indices)
+        return [None if self.missing[index] else string for index, string in zip(indices, strings)]
+
+    def to_list(self):
+        """Returns all strings (None for missing values)."""
+        strings = decode_strings(self.buffer, self.offsets)
+        for missing_index in np.flatnonzero(self.missing):
+            strings[missing_index] = None
+        return strings
+
+# Cell
+def load_encoded_dataframe_from_npz(path, mmap=False):
+    """Loads a dataframe saved with save_dataframe_as_npz without decoding the strings, returns the dataframe, the encoded string columns and the metadata.
+    The string columns with repeated values are categorical, the other string columns (e.g. RLEs) are returned as dict of EncodedStrings and are not part of the dataframe.
+    With mmap the numeric, bool and datetime columns, the codes and the encoded strings are memory-mapped (read only), so only the categories are read."""
+    arrays = load_npz_arrays(path, mmap)
+    metadata = json.loads(str(arrays["metadata"]))
+    data, encoded_strings = {}, {}
+    for index, column_info in enumerate(metadata["columns"]):
+        key = "column_"+str(index)
+        if column_info["kind"] == "strings":
+            encoded_strings[column_info["name"]] = EncodedStrings(arrays[key+"_buffer"], arrays[key+"_offsets"], arrays[key+"_missing"])
+            continue
+        # plain ndarray views of the memory-mapped arrays
+        values = np.asarray(arrays[key])
+        if column_info["kind"] == "array":
+            data[column_info["name"]] = pd.Series(values, dtype=column_info["dtype"], copy=False)
+        else:
+            if column_info.get("string_categories", False):
+                categories = decode_strings(arrays[key+"_categories_buffer"], arrays[key+"_categories_offsets"])
+            else:
+                categories = arrays[key+"_categories"]
+            data[column_info["name"]] = pd.Series(pd.Categorical.from_codes(values, categories))
+    return pd.DataFrame(data, copy=False), encoded_strings, metadata["metadata"]
+
+# Cell
+def load_dataframe_from_npz(path, mmap=False):
+    """Loads a dataframe saved with save_dataframe_as_npz, returns the dataframe and the metadata. All string columns are decoded and have their saved dtype,
+    with mmap only the numeric, bool and datetime columns are memory-mapped (see load_encoded_dataframe_from_npz to keep the strings encoded)."""
+    df, encoded_strings, metadata = load_encoded_dataframe_from_npz(path, mmap)
+    # only the metadata member is read
+    with np.load(path, allow_pickle=False) as arrays:
+        column_infos = json.loads(str(arrays["metadata"]))["columns"]
+    data = {}
+    for column_info in column_infos:
+        name = column_info["name"]
+        if name in encoded_strings:
+            data[name] = pd.Series(encoded_strings[name].to_list(), dtype=column_info["dtype"])
+        elif column_info["kind"] == "factorized":
+            data[name] = df[name].astype(column_info["dtype"])
+        else:
+            data[name] = df[name]
+    return pd.DataFrame(data, copy=False), metadata
+
+# Cell
+def compact_dataframe(df, allow_float32_rounding=False, max_category_fraction=0.5):
+    """Returns a copy of the dataframe that uses less memory: string columns with repeated values (at most max_category_fraction unique values per row, e.g. filepath, label and class_map)
+    become categorical (every value is stored once), unused categories are removed, integer columns are downcast to the smallest integer dtype
+    and float columns to float32 if no value changes (all float columns with allow_float32_rounding)."""
+    data = {}
+    for name, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.cat.remove_unused_categories()
+        elif pd.api.types.is_bool_dtype(column.dtype) or pd.api.types.is_datetime64_any_dtype(column.dtype):
+            pass
+        elif pd.api.types.is_integer_dtype(column.dtype):
+            column = pd.to_numeric(column, downcast="integer")
+        elif pd.api.types.is_float_dtype(column.dtype):
+            float32_column = column.astype(np.float32)
+            if allow_float32_rounding or np.array_equal(float32_column.to_numpy(dtype=float), column.to_numpy(dtype=float), equal_nan=True):
+                column = float32_column
+        elif column.nunique(dropna=False) <= max_category_fraction*len(column):
+            column = column.astype("category")
+        data[name] = column
+    return pd.DataFrame(data, index=df.index)
+
+# Cell
+def expand_dataframe(df):
+    """Returns a copy of a compact dataframe (see compact_dataframe) with the default dtypes: categorical columns get the dtype of their categories,
+    integer columns become int64 and float columns float64 (values rounded to float32 stay rounded)."""
+    data = {}
+    for name, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(column.cat.categories.dtype)
+        elif pd.api.types.is_bool_dtype(column.dtype) or pd.api.types.is_datetime64_any_dtype(column.dtype):
+            pass
+        elif pd.api.types.is_integer_dtype(column.dtype):
+            column = column.astype(np.int64)
+        elif pd.api.types.is_float_dtype(column.dtype):
+            column = column.astype(np.float64)
+        data[name] = column
+    return pd.DataFrame(data, index=df.index)
+
+# Cell
+def memory_usage_report(df, compact_df):
+    """Returns the dtypes and memory usage (in bytes, including the strings) of every column of a dataframe and of its compact version, the last row is the total."""
+    bytes_before, bytes_after = df.memory_usage(index=False, deep=True), compact_df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        "column": list(bytes_before.index)+["total"], "dtype": [str(dtype) for dtype in df.dtypes]+[""], "compact_dtype": [str(dtype) for dtype in compact_df.dtypes]+[""],
+        "bytes": list(bytes_before.values)+[bytes_before.sum()], "compact_bytes": list(bytes_after.values)+[bytes_after.sum()]
+    })
+    report["reduction"] = 1-report["compact_bytes"]/report["bytes"]
+    return report